@@ -2,17 +2,34 @@
 # Slang
 
 from .ast import *
+from .cache import *
 from .compilers import *
 from utils.nolog import *; logstart('Slang')
 
-def compile(src, filename='<string>', *, compiler, optimize=0):
-	try:
-		#print(f"Source: {{\n{S(src).indent()}\n}}\n")
-
+def parse(src, filename='<string>', *, cache=True):
+	key = cache_key(src, filename) if (cache) else None
+	ast = load_ast(key) if (cache) else None
+	if (ast is None):
 		tl = parse_string(src)
 		#print(f"Tokens:\n{pformat(tl)}\n")
 
-		ast = build_ast(tl, filename.join('""'))
+		stats = collections.Counter()
+		ast = build_ast(tl, filename.join('""'), stats=stats)
+		dlog(f"Statements: {stats['statements']}, fallback: {stats['fallback']}")
+		if (cache): store_ast(key, ast)
+	return ast
+
+def check(src, filename='<string>', *, jobs=None, cache=True):
+	try: check_ast(parse(src, filename, cache=cache), jobs=jobs)
+	except (SlSyntaxException, SlNodeException) as ex:
+		if (not ex.srclines): ex.srclines = src.split('\n')
+		sys.exit(str(ex))
+
+def compile(src, filename='<string>', *, compiler, optimize=0, cache=True):
+	try:
+		#print(f"Source: {{\n{S(src).indent()}\n}}\n")
+
+		ast = parse(src, filename, cache=cache)
 		print(f"Code: {ast.code}\n")
 
 		#print(f"Nodes: {pformat(list(walk_ast_nodes(ast)))}\n")
@@ -36,14 +53,18 @@ def compile(src, filename='<string>', *, compiler, optimize=0):
 @aparg('-o', metavar='output', dest='output')
 @aparg('-f', metavar='compiler', dest='compiler', default='pyssembly')#required=True)
 @aparg('-O', metavar='level', help='Code optimization level', type=int, default=DEFAULT_OLEVEL)
+@aparg('--no-cache', help=f"Don't use the parse cache (in {CACHE_DIR})", dest='cache', action='store_false')
+@aparg('--check', help="Only validate the code, checking the functions in parallel", action='store_true')
+@aparg('-j', metavar='jobs', help='Number of processes for --check (default: number of CPUs)', dest='jobs', type=int)
 def main(cargs):
+	if (cargs.check): return check(read_source(cargs.file), filename=cargs.file.name, jobs=cargs.jobs, cache=cargs.cache)
 	if (cargs.output is None and not cargs.file.name.rpartition('.')[0]):
 		argparser.add_argument('-o', dest='output', required=True)
 		cargs = argparser.parse_args()
-	src = cargs.file.read()
+	src = read_source(cargs.file)
 	filename = cargs.file.name
 	compiler = importlib.import_module('.compilers.'+cargs.compiler, package=__package__).__dict__['compiler']
-	code = compile(src, filename=filename, compiler=compiler, optimize=cargs.O)
+	code = compile(src, filename=filename, compiler=compiler, optimize=cargs.O, cache=cargs.cache)
 	open(cargs.output or cargs.file.name.rpartition('.')[0]+compiler.ext, 'wb').write(code)
 
 if (__name__ == '__main__'): exit(main())
@@ -1,7 +1,7 @@
 #!/usr/bin/python3
 # Slang AST
 
-import abc
+import abc, inspect, multiprocessing, concurrent.futures
 from . import sld
 from .lexer import *
 from utils import *
@@ -14,29 +14,128 @@ def warn(class_, msg, node, ns):
 	if (ns.warnclasses and class_ not in ns.warnclasses): return
 	logexception(Warning(f"{msg} \033[2m(at line {node.lineno}, offset {node.offset})\033[0m \033[8m({class_})\033[0m"), raw=True, once=True)
 
+def packrat(f):
+	# Memoizes `build(cls, tl, ...)' per token span in `tl.memo', failures included.
+	# A hit returns the cached node itself: it's built for one token span, and only the attempt it was built in, which was given up, could hold it too, so no two places of a tree share it.
+	@functools.wraps(f)
+	def decorated(cls, tl, *args, **kwargs):
+		if (tl.memo is None): return f(cls, tl, *args, **kwargs)
+		key = (cls, tl.pos, tl.end, args, tuple(kwargs.items()))
+		try: r, m = tl.memo[key]
+		except KeyError:
+			try: r = f(cls, tl, *args, **kwargs)
+			except SlSyntaxException as ex: tl.memo[key] = (ex, tl.mark()); raise
+			tl.memo[key] = (r, tl.mark())
+			return r
+		tl.reset(m)
+		if (isinstance(r, SlSyntaxException)):  # raised as a fresh instance, as `build_ast()' sets `usage' on each one
+			ex = type(r).__new__(type(r), *r.args)
+			ex.__dict__.update(r.__dict__)
+			for i in allslots(r):
+				if (hasattr(r, i)): setattr(ex, i, getattr(r, i))
+			raise ex
+		return r
+	return decorated
+
+dispatch_registry = dict()  # `(module, qualname)' → `(dispatcher, overloads, table)', see `typedispatch()'
+
+def typedispatch(f):
+	# `utils.dispatch()' for the hot paths: calls the first overload (in order of definition) that binds the arguments and whose annotations they satisfy.
+	# The choice is remembered per tuple of argument types; if a predicate annotation had to be tried to make it, the overloads that these types leave possible are remembered instead, and tried on every call.
+	try: dispatcher, overloads, table = dispatch_registry[f.__module__, f.__qualname__]
+	except KeyError:
+		overloads, table = list(), dict()
+
+		@functools.wraps(f)
+		def dispatcher(*args, **kwargs):
+			key = tuple(map(type, args)) if (not kwargs) else (*map(type, args), *((k, type(v)) for k, v in kwargs.items()))
+			try: r = table[key]
+			except KeyError:
+				r, static = dispatch_resolve(dispatcher, overloads, args, kwargs)
+				table[key] = r if (static) else [(f, sig) for f, sig in overloads if dispatch_matches(sig, args, kwargs, predicates=False)[0]]
+			else:
+				if (type(r) is list): r = dispatch_resolve(dispatcher, r, args, kwargs)[0]
+			return r(*args, **kwargs)
+
+		dispatch_registry[f.__module__, f.__qualname__] = (dispatcher, overloads, table)
+	overloads.append((f, inspect.signature(f)))
+	table.clear()
+	return dispatcher
+
+def dispatch_resolve(dispatcher, overloads, args, kwargs):
+	# → `(overload, whether any arguments of the same types would get it too)'
+	static = True
+	for f, sig in overloads:
+		ok, s = dispatch_matches(sig, args, kwargs)
+		static &= s
+		if (ok): return (f, static)
+	raise TypeError(f"No overload of {dispatcher.__qualname__}() matches ({', '.join(type(i).__name__ for i in args)})")
+
+def dispatch_matches(sig, args, kwargs, *, predicates=True):
+	# → `(whether the arguments bind to `sig' and satisfy its annotations, whether their types alone told)'; predicate annotations are taken as satisfied unless `predicates'
+	try: bound = sig.bind(*args, **kwargs).arguments
+	except TypeError: return (False, True)
+	static = True
+	for k, v in bound.items():
+		p = sig.parameters[k]
+		if (p.annotation is p.empty): continue
+		l = v if (p.kind == p.VAR_POSITIONAL) else v.values() if (p.kind == p.VAR_KEYWORD) else (v,)
+		if (isinstance(p.annotation, type)): ok = all(isinstance(i, p.annotation) for i in l)
+		else:
+			static = False
+			if (not predicates): continue
+			origin = typing.get_origin(p.annotation)
+			ok = all((isinstance(i, origin) if (origin is not None) else p.annotation(i)) for i in l)
+		if (not ok): return (False, static)
+	return (True, static)
+
 def eval_literal(x):
 	return eval(literal_repr(x))
 
 def literal_repr(x):
 	return (str if (isinstance(x, ASTNode)) else repr)(x)
 
+@functools.lru_cache(maxsize=4096)  # the literal has to be evaluated to tell its type
 def literal_type(x):
 	r = eval(str(x))
 	if (isinstance(r, str) and len(r) == 1 and re.match(r"'.+?'", x.strip())): return stdlib.char
 	return type(r)
 
 def common_type(l, ns): # TODO
-	r = Slist(Signature.build(i, ns) for i in l).uniquize()
-	r.reverse(); r = r.uniquize()
+	r = list()
+	for i in l:
+		sig = Signature.build(i, ns)
+		if (not any(j.matches(sig) for j in r)): r.append(sig)
+	r.reverse()
 	if (not r): return None
 	r = [i for i in r if not isinstance(i, stdlib.auto)]
 	if (len(r) > 1): raise TODO(r)
 	return first(r)
 
+node_fields = dict()  # node class → slots that may hold child nodes, computed once per class
+def ast_fields(node):
+	try: return node_fields[type(node)]
+	except KeyError: pass
+	r = node_fields[type(node)] = tuple(i for i in allslots(node) if i not in ('lineno', 'offset', 'flags', 'extent'))
+	return r
+
+def ast_children(node):
+	for i in ast_fields(node):
+		v = getattr(node, i, None)
+		if (isinstance(v, ASTNode)): yield v; continue
+		if (not isiterable(v) or isinstance(v, str)): continue
+		stack = [iter(v)]
+		while (stack):
+			for j in stack[-1]:
+				if (isinstance(j, ASTNode)): yield j
+				elif (isiterable(j) and not isinstance(j, str)): stack.append(iter(j)); break
+			else: stack.pop()
+
 class ASTNode(ABCSlots):
 	lineno: ...
 	offset: ...
 	flags: ...
+	extent: None  # `measure()' result, cached
 
 	@abc.abstractmethod
 	@init_defaults
@@ -55,28 +154,31 @@ class ASTNode(ABCSlots):
 		if (not tl): raise SlSyntaxNoToken()
 
 	def validate(self, ns):
-		for i in allslots(self):
-			v = getattr(self, i)
-			if (isiterablenostr(v)):
-				for jj, j in enumerate(v):
-					if (hasattr(j, 'validate')):
-						j.validate(ns)
-			elif (hasattr(v, 'validate') and not isinstance(v, ASTCodeNode)):
-				v.validate(ns)
+		# Validates the node and the nodes below it in one walk, see `ASTValidator': `validate_enter()' of each node before its children, `validate_leave()' after them.
+		ASTValidator(ns).walk(self)
+
+	def validate_enter(self, ns):
+		# → False to skip the children and `validate_leave()'
+		pass
+
+	def validate_leave(self, ns):
+		pass
 
 	def optimize(self, ns):
-		for i in allslots(self):
+		# → the node that replaces this one, or None; see `ASTOptimizer'
+		r = ASTOptimizer(ns).walk(self)
+		return r if (r is not self) else None
+
+	def optimize_enter(self, ns):
+		pass
+
+	def optimize_leave(self, ns):
+		# → the node that replaces this one, or None
+		for i in ast_fields(self):
 			v = getattr(self, i)
-			if (isiterablenostr(v)):
-				for jj, j in enumerate(v.copy()):
-					if (hasattr(j, 'optimize')):
-						r = j.optimize(ns)
-						if (r is not None): v[jj] = r
-						if (v[jj].flags.optimized_out): del v[jj]
-			elif (hasattr(v, 'optimize') and not isinstance(v, ASTCodeNode)):
-				r = v.optimize(ns)
-				if (r is not None): setattr(self, i, r)
-				if (getattr(self, i).flags.optimized_out): setattr(self, i, None)
+			if (isinstance(v, list)): v[:] = (j for j in v if not (isinstance(j, ASTNode) and j.flags.optimized_out))
+			elif (isinstance(v, ASTNode) and not isinstance(v, ASTCodeNode) and v.flags.optimized_out): setattr(self, i, None)
+		ns.signature_cache.forget(id(self))  # its children may have been replaced
 		self.flags.optimized = 1
 
 	@classproperty
@@ -85,8 +187,34 @@ class ASTNode(ABCSlots):
 
 	@property
 	def length(self):
-		#dlog(max((getattr(self, i) for i in allslots(self) if hasattr(getattr(self, i), 'offset')), key=lambda x: (x.lineno, x.offset)
-		return sum(getattr(self, i).length for i in allslots(self) if hasattr(getattr(self, i), 'length'))
+		return self.measure()[0]
+
+	@property
+	def span(self):
+		# `((lineno, offset), (lineno, offset))' from the start of the first token of the node to the end of its last one
+		return self.measure()[1:]
+
+	def measure(self):
+		# `(length, start, end)', computed once for the node and everything below it that wasn't measured yet
+		if (self.extent is not None): return self.extent
+		stack = [(self, False)]
+		while (stack):
+			node, done = stack.pop()
+			if (not done):
+				stack.append((node, True))
+				stack += ((i, False) for i in ast_children(node) if i.extent is None and not isinstance(i, ASTTokenNode))
+				continue
+			length, start, end = 0, None, None
+			for i in ast_fields(node):
+				v = getattr(node, i)
+				if (isinstance(v, ASTNode)): length += v.measure()[0]
+				elif (hasattr(v, 'length')): length += v.length
+			for i in ast_children(node):
+				_, s, e = i.measure()
+				if (s is not None and (start is None or s < start)): start = s
+				if (e is not None and (end is None or e > end)): end = e
+			node.extent = (length, start, end)
+		return self.extent
 
 class ASTRootNode(ASTNode):
 	code: ...
@@ -103,18 +231,26 @@ class ASTRootNode(ASTNode):
 
 	@classmethod
 	def build(cls, name=None):
-		code = (yield from ASTCodeNode.build([], name=name))
+		code = (yield from ASTCodeNode.build(TokenCursor([]), name=name))
 		return cls(code, lineno=code.lineno, offset=code.offset)
 
 	def validate(self, ns=None):
+		global validation_generation
 		if (ns is None): ns = Namespace(self.code.name)
+		validation_generation += 1
 		super().validate(ns)
-		self.code.validate(ns)
 		return ns
 
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
+		self.code.validate(ns)
+
 	def optimize(self, ns, level=DEFAULT_OLEVEL):
 		ns.olevel = level
-		super().optimize(ns)
+		return super().optimize(ns)
+
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
 		self.code.optimize(ns)
 
 class ASTCodeNode(ASTNode):
@@ -153,32 +289,26 @@ class ASTCodeNode(ASTNode):
 	#	for i in self.nodes:
 	#		i.validate(ns)
 
-	def optimize(self, ns):
-		for ii, i in enumerate(self.nodes):
-			r = i.optimize(ns)
-			if (r is not None): self.nodes[ii] = r
-		self.nodes = [i for i in self.nodes if not i.flags.optimized_out]
-
 class ASTTokenNode(ASTNode):
 	length: ...
 
 	def __init__(self, **kwargs):
 		super().__init__(**kwargs)
-		self.length = sum(len(getattr(self, i)) for i in allslots(self) if isinstance(getattr(self, i, None), str))
+		self.length = sum(len(getattr(self, i)) for i in ast_fields(self) if isinstance(getattr(self, i, None), str))
+
+	def measure(self):
+		return (self.length, (self.lineno, self.offset), (self.lineno, self.offset+self.length))
 
 	@abc.abstractclassmethod
 	def build(cls, tl):
 		super().build(tl)
-		off = int()
-		for ii, i in enumerate(tl.copy()):
-			if (i.typename == 'SPECIAL' and (i.token[0] == '#' or i.token == '\\')): del tl[ii-off]; off += 1
 		if (not tl): raise SlSyntaxEmpty()
 
 class ASTIdentifierNode(ASTTokenNode):
 	identifier: ...
 
 	def __init__(self, identifier, **kwargs):
-		self.identifier = identifier
+		self.identifier = sys.intern(identifier)
 		super().__init__(**kwargs)
 
 	def __str__(self):
@@ -287,7 +417,6 @@ class ASTSpecialNode(ASTTokenNode):
 
 		if (tl[0].typename != 'SPECIAL'): raise SlSyntaxExpectedError('SPECIAL', tl[0])
 		special = tl.pop(0).token
-		if (special == '\\'): raise SlSyntaxEmpty()
 
 		return cls(special, lineno=lineno, offset=offset)
 
@@ -304,6 +433,7 @@ class ASTValueNode(ASTPrimitiveNode):
 		return str(self.value)
 
 	@classmethod
+	@packrat
 	def build(cls, tl, *, fcall=False, attrget=False):
 		super().build(tl)
 		lineno, offset = tl[0].lineno, tl[0].offset
@@ -312,25 +442,27 @@ class ASTValueNode(ASTPrimitiveNode):
 		if (fcall): types.remove(ASTFunccallNode); types.remove(ASTLambdaNode) # XXX lambda too?
 		if (attrget): types.remove(ASTAttrgetNode)
 		err = set()
+		m = tl.mark()
 		for i in types:
-			tll = tl.copy()
-			try: value = i.build(tll, **{'attrget': attrget} if (i in (ASTFunccallNode,)) else {})
-			except SlSyntaxExpectedError as ex: err.add(ex); continue
-			except SlSyntaxException: continue
-			else: tl[:] = tll; break
+			try: value = i.build(tl, **{'attrget': attrget} if (i in (ASTFunccallNode,)) else {})
+			except SlSyntaxExpectedError as ex: err.add(ex); tl.reset(m); continue
+			except SlSyntaxException: tl.reset(m); continue
+			else: break
 		else: raise SlSyntaxMultiExpectedError.from_list(err)
 
 		return cls(value, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		if (isinstance(self.value, ASTIdentifierNode)):
 			if (self.value.identifier not in ns): raise SlValidationNotDefinedError(self.value, self, scope=ns.scope)
 			if (ns.values.get(self.value.identifier) is None): raise SlValidationError(f"{self.value.identifier} is not initialized", self.value, self, scope=ns.scope)
 
-	def optimize(self, ns):
-		super().optimize(ns)
-		if (isinstance(self.value, ASTIdentifierNode) and ns.values.get(self.value) not in (None, ...)): self.value = ns.values[self.value] if (isinstance(ns.values[self.value], ASTNode)) else ASTLiteralNode(literal_repr(ns.values[self.value]), lineno=self.lineno, offset=self.offset) # TODO FIXME in functions
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
+		if (isinstance(self.value, ASTIdentifierNode) and ns.values.get(self.value) not in (None, ...)):
+			self.value = ns.values[self.value] if (isinstance(ns.values[self.value], ASTNode)) else ASTLiteralNode(literal_repr(ns.values[self.value]), lineno=self.lineno, offset=self.offset) # TODO FIXME in functions
+			ns.signature_cache.forget(id(self))
 
 class ASTItemgetNode(ASTPrimitiveNode):
 	value: ...
@@ -368,8 +500,8 @@ class ASTItemgetNode(ASTPrimitiveNode):
 
 		return cls(value, key, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		valsig = Signature.build(self.value, ns)
 		keysig = Signature.build(self.key, ns)
 		if ((keysig, self.key) not in valsig.itemget): raise SlValidationError(f"`{valsig}' does not support itemget by key of type `{keysig}'", self.key, self, scope=ns.scope)
@@ -398,44 +530,46 @@ class ASTAttrgetNode(ASTPrimitiveNode):
 
 		return cls(value, optype, attr, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		valsig = Signature.build(self.value, ns)
 		if ((self.optype.special, self.attr.identifier) not in valsig.attrops): raise SlValidationError(f"`{valsig}' does not support attribute operation `{self.optype}' with attr `{self.attr}'", self.optype, self, scope=ns.scope)
 
 class ASTExprNode(ASTPrimitiveNode):
 	@classmethod
+	@packrat
 	def build(cls, tl, *, fcall=False, attrget=False):
 		super().build(tl)
 		lineno, offset = tl[0].lineno, tl[0].offset
 
+		value = ASTBinaryExprNode.build_flat(tl)
+		if (value is not None): return value
+
+		m = tl.mark()
+
 		for ii, p in enumerate(operators[::-1]):
-			tll = tl.copy()
-			try: value = ASTBinaryExprNode.build(tll, p)
-			except SlSyntaxException: continue
-			else: tl[:] = tll; return value
+			try: value = ASTBinaryExprNode.build(tl, p)
+			except SlSyntaxException: tl.reset(m); continue
+			else: return value
 
 		for i in allsubclasses(ASTUnaryOperationNode):
-			tll = tl.copy()
-			try: value = i.build(tll)
-			except SlSyntaxException: pass
-			else: tl[:] = tll; return value
+			try: value = i.build(tl)
+			except SlSyntaxException: tl.reset(m)
+			else: return value
 
-		tll = tl.copy()
-		try: value = ASTUnaryExprNode.build(tll)
-		except SlSyntaxException: pass
-		else: tl[:] = tll; return value
+		try: value = ASTUnaryExprNode.build(tl)
+		except SlSyntaxException: tl.reset(m)
+		else: return value
 
-		tll = tl.copy()
-		try: value = ASTValueNode.build(tll, fcall=fcall, attrget=attrget)
-		except SlSyntaxException as ex: pass
-		else: tl[:] = tll; return value
+		try: value = ASTValueNode.build(tl, fcall=fcall, attrget=attrget)
+		except SlSyntaxException as ex: tl.reset(m)
+		else: return value
 
 		try:
 			parenthesis = ASTSpecialNode.build(tl)
 			if (parenthesis.special != '('): raise SlSyntaxExpectedError('Expr', parenthesis)
-			parenthesized = list()
-			lvl = 1
+			parenthesized = tl.copy()
+			lvl, n = 1, 0
 			while (tl):
 				if (tl[0].typename == 'SPECIAL'): lvl += 1 if (tl[0].token == '(') else -1 if (tl[0].token == ')') else 0
 				if (lvl == 0):
@@ -443,7 +577,8 @@ class ASTExprNode(ASTPrimitiveNode):
 					if (parenthesis.special != ')'): raise SlSyntaxExpectedError("')'", parenthesis)
 					break
 				assert (lvl > 0)
-				parenthesized.append(tl.pop(0))
+				tl.pop(0); n += 1
+			parenthesized = parenthesized[:n]
 			value = ASTExprNode.build(parenthesized)
 			if (parenthesized): raise SlSyntaxExpectedNothingError(parenthesized[0])
 		except SlSyntaxException: pass # TODO
@@ -471,14 +606,14 @@ class ASTUnaryExprNode(ASTExprNode):
 
 		return cls(operator, value, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		valsig = Signature.build(self.value, ns)
 		op = self.operator.operator
 		if (op not in valsig.operators): raise SlValidationError(f"`{valsig}' does not support unary operator `{op}'", self.operator, self, scope=ns.scope)
 
-	def optimize(self, ns):
-		super().optimize(ns)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
 		if (isinstance(self.value, ASTUnaryExprNode)): return self.value.value
 		elif (ns.values.get(self.value) not in (None, ...)): return ASTValueNode(ASTLiteralNode(literal_repr(eval(f"{'not' if (self.operator.operator == '!') else self.operator} ({literal_repr(ns.values[self.value])})")), lineno=self.lineno, offset=self.offset), lineno=self.lineno, offset=self.offset)
 
@@ -501,9 +636,12 @@ class ASTBinaryExprNode(ASTExprNode):
 		lineno, offset = tl[0].lineno, tl[0].offset
 
 		lasti = list()
-		lvl = int()
+		lvl = depth = int()
 		for ii, i in enumerate(tl):
-			if (i.typename == 'SPECIAL'): lvl += 1 if (i.token == '(') else -1 if (i.token == ')') else 0
+			if (i.typename == 'SPECIAL'):
+				lvl += 1 if (i.token == '(') else -1 if (i.token == ')') else 0
+				depth += 1 if (i.token in '([{') else -1 if (i.token in ')]}') else 0
+				if (depth < 0 or depth == 0 and i.token == ','): break  # no expression spans an unmatched bracket or a bare comma
 			if (lvl > 0): continue
 			if (i.typename == 'OPERATOR' and isinstance(i.token, BinaryOperator) and i.token in opset): lasti.append(ii)
 		for i in lasti[::-1]:
@@ -520,16 +658,65 @@ class ASTBinaryExprNode(ASTExprNode):
 
 		return cls(lvalue, operator, rvalue, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	@classmethod
+	def build_flat(cls, tl):
+		# Precedence climbing over `operand (op operand)*'; returns None (leaving `tl' intact) where the result could differ from `build()' backtracking.
+		operands, ops = [[]], list()
+		lvl = int()
+		prev = None
+		for i in tl:
+			if (i.typename == 'KEYWORD' or i.typename == 'SPECIAL' and i.token not in ('(', ')', '[', ']', ',', '.')): return None
+			if (i.typename == 'OPERATOR' and i.token in ('++', '--')): return None
+			if (i.typename == 'OPERATOR' and isinstance(i.token, BinaryOperator) and prev is not None and prev.typename == 'OPERATOR' and prev.token == '**'): return None  # `a ** -b' may be `(a**) - b'
+			prev = i
+			if (i.typename == 'SPECIAL'):
+				lvl += 1 if (i.token in '([') else -1 if (i.token in ')]') else 0
+				if (lvl < 0 or lvl == 0 and i.token == ','): return None  # the expression can't consume the rest of `tl'
+			elif (lvl == 0 and i.typename == 'OPERATOR' and isinstance(i.token, BinaryOperator) and operands[-1] and operands[-1][-1].typename != 'OPERATOR'):
+				ops.append(i)
+				operands.append([])
+				continue
+			operands[-1].append(i)
+		if (not ops or lvl != 0 or not operands[-1]): return None
+
+		values = list()
+		for i in operands:
+			if (len(i) == 1 and i[0].typename in ('IDENTIFIER', 'LITERAL')): value = ASTValueNode((ASTIdentifierNode if (i[0].typename == 'IDENTIFIER') else ASTLiteralNode).build(TokenCursor(i)), lineno=i[0].lineno, offset=i[0].offset)
+			else:
+				tll = TokenCursor(i)
+				try: value = ASTExprNode.build(tll)
+				except SlSyntaxException: return None
+				if (tll): return None
+			values.append((value, i[0].lineno, i[0].offset))
+
+		levels = [operator_levels[i.token] for i in ops]
+		pos = int()
+		def climb(maxlvl):
+			nonlocal pos
+			lvalue, lineno, offset = values[pos]
+			while (pos < len(ops) and levels[pos] <= maxlvl):
+				op = ops[pos]
+				pos += 1
+				lvalue = cls(lvalue, ASTBinaryOperatorNode.build(TokenCursor([op])), climb(operator_levels[op.token]-1), lineno=lineno, offset=offset)
+			return lvalue
+
+		value = climb(len(operators))
+		tl.clear()
+		return value
+
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		lsig = Signature.build(self.lvalue, ns)
 		rsig = Signature.build(self.rvalue, ns)
 		op = self.operator.operator
 		if ((op, rsig) not in lsig.operators): raise SlValidationError(f"`{lsig}' does not support operator `{op}' with operand of type `{rsig}'", self.operator, self, scope=ns.scope)
 
-	def optimize(self, ns):
-		super().optimize(ns)
-		if (self.operator.operator == '**' and ns.values.get(self.lvalue) == 2 and ns.values.get(self.rvalue) is not ... and (ns.values.get(self.rvalue) or 0) > 0): self.operator.operator, self.lvalue.value = BinaryOperator('<<'), ASTLiteralNode('1', lineno=self.lvalue.value.lineno, offset=self.lvalue.value.offset)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
+		if (self.operator.operator == '**' and ns.values.get(self.lvalue) == 2 and ns.values.get(self.rvalue) is not ... and (ns.values.get(self.rvalue) or 0) > 0):
+			self.operator.operator, self.lvalue.value = BinaryOperator('<<'), ASTLiteralNode('1', lineno=self.lvalue.value.lineno, offset=self.lvalue.value.offset)
+			ns.signature_cache.forget(id(self.lvalue))
+			ns.signature_cache.forget(id(self))
 		if (ns.values.get(self.lvalue) not in (None, ...) and ns.values.get(self.rvalue) not in (None, ...) and self.operator.operator != 'to'): return ASTValueNode(ASTLiteralNode(literal_repr(eval(f"({literal_repr(ns.values[self.lvalue])}) {self.operator} ({literal_repr(ns.values[self.rvalue])})")), lineno=self.lineno, offset=self.offset), lineno=self.lineno, offset=self.offset)
 
 class ASTLiteralStructNode(ASTNode): pass
@@ -568,11 +755,11 @@ class ASTListNode(ASTLiteralStructNode):
 
 		return cls(type, values, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		typesig = Signature.build(self.type, ns)
 		for i in self.values:
-			if (Signature.build(i, ns) != typesig): raise SlValidationError(f"List item `{i}' does not match list type `{self.type}'", i, self, scope=ns.scope)
+			if (not Signature.build(i, ns).matches(typesig)): raise SlValidationError(f"List item `{i}' does not match list type `{self.type}'", i, self, scope=ns.scope)
 
 class ASTTupleNode(ASTLiteralStructNode):
 	types: ...
@@ -606,10 +793,10 @@ class ASTTupleNode(ASTLiteralStructNode):
 
 		return cls(types, values, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		for i in range(len(self.values)):
-			if (Signature.build(self.values[i], ns) != Signature.build(self.types[i], ns)): raise SlValidationError(f"Tuple item `{self.values[i]}' does not match its type `{self.types[i]}'", self.values[i], self, scope=ns.scope)
+			if (not Signature.build(self.values[i], ns).matches(Signature.build(self.types[i], ns))): raise SlValidationError(f"Tuple item `{self.values[i]}' does not match its type `{self.types[i]}'", self.values[i], self, scope=ns.scope)
 
 class ASTNonFinalNode(ASTNode): pass
 
@@ -662,8 +849,8 @@ class ASTArgdefNode(ASTNonFinalNode):
 
 		return cls(type, name, modifier, defvalue, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		assert (self.modifier != '=' or self.defvalue is not None)
 		if (isinstance(Signature.build(self.type, ns), stdlib.void)): raise SlValidationError(f"Argument cannot have type `{self.type}'", self.type, self, scope=ns.scope)
 
@@ -738,9 +925,15 @@ class ASTCallkwargsNode(ASTNonFinalNode):
 		return cls(callkwargs, starkwargs, lineno=lineno, offset=offset)
 
 class ASTCallableNode(ASTNode):
-	def validate(self, ns): # XXX.
-		super().validate(ns)
-		code_ns = ns.derive(self.code.name)
+	deferrable = True  # whether `check_ast()' may validate the code later
+
+	def validate_leave(self, ns): # XXX.
+		super().validate_leave(ns)
+		if (deferred_code is not None and self.deferrable): deferred_code.append((self, ns))
+		else: self.validate_code(ns)
+
+	def validate_code(self, ns):
+		code_ns = ns.derive(self.code)
 		if (hasattr(self, 'name')):
 			code_ns.define(self, redefine=True)
 			code_ns.values[self.name] = ...
@@ -749,24 +942,24 @@ class ASTCallableNode(ASTNode):
 			code_ns.values[i.name] = ...
 		self.code.validate(code_ns)
 
-	def optimize(self, ns):
-		super().optimize(ns)
-		code_ns = ns.derive(self.code.name)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
+		code_ns = ns.derive(self.code)
 		for i in self.argdefs:
 			code_ns.values[i.name] = ...
 		code_ns.values.parent = None # XXX
 		self.code.optimize(code_ns)
 
 class ASTFunctionNode(ASTCallableNode):
-	def validate(self, ns): # XXX.
-		super().validate(ns)
-		code_ns = ns.derive(self.code.name)
+	def validate_code(self, ns): # XXX.
+		super().validate_code(ns)
+		code_ns = ns.derive(self.code)
 		rettype = Signature.build(self.type, ns)
 		return_nodes = tuple(i.value for i in self.code.nodes if (isinstance(i, ASTKeywordExprNode) and i.keyword.keyword == 'return'))
-		if (not return_nodes and rettype != stdlib.void()): raise SlValidationError(f"Not returning value from function with return type `{rettype}'", self.code, self, scope=ns.scope)
+		if (not return_nodes and not rettype.matches(stdlib.void())): raise SlValidationError(f"Not returning value from function with return type `{rettype}'", self.code, self, scope=ns.scope)
 		for i in return_nodes:
 			fsig = Signature.build(i, code_ns)
-			if (rettype == stdlib.void() and fsig != rettype): raise SlValidationError(f"Returning value from function with return type `{rettype}'", i, self, scope=ns.scope)
+			if (rettype.matches(stdlib.void()) and not fsig.matches(rettype)): raise SlValidationError(f"Returning value from function with return type `{rettype}'", i, self, scope=ns.scope)
 			if (common_type((fsig, rettype), code_ns) is None): raise SlValidationError(f"Returning value of incompatible type `{fsig}' from function with return type `{rettype}'", i, self, scope=ns.scope)
 
 class ASTLambdaNode(ASTNonFinalNode, ASTFunctionNode):
@@ -835,21 +1028,21 @@ class ASTBlockNode(ASTNonFinalNode):
 
 		return cls(code, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		self.code.validate(ns)
 
-	def optimize(self, ns):
-		super().optimize(ns)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
 		self.code.optimize(ns)
 
 class ASTFinalNode(ASTNode): pass
 
 class ASTDefinitionNode(ASTNode):
-	def validate(self, ns): # XXX.
+	def validate_enter(self, ns): # XXX.
 		Signature.build(self, ns)
 		ns.define(self)
-		super().validate(ns)
+		return super().validate_enter(ns)
 
 class ASTFuncdefNode(ASTFinalNode, ASTDefinitionNode, ASTFunctionNode):
 	type: ...
@@ -907,6 +1100,7 @@ class ASTClassdefNode(ASTFinalNode, ASTDefinitionNode, ASTCallableNode):
 	type: ...
 
 	argdefs = ()
+	deferrable = False  # the code declares the members that later statements use; only the code of the methods is deferred
 
 	def __init__(self, name, bases, code, **kwargs):
 		super().__init__(**kwargs)
@@ -969,7 +1163,7 @@ class ASTKeywordExprNode(ASTFinalNode):
 
 		return cls(keyword, value, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
+	def validate_enter(self, ns):
 		if (self.keyword.keyword == 'import'):
 			m = re.fullmatch(r'(?:(?:(\w+):)?(?:([\w./]+)/)?([\w.]+):)?([\w*]+)', self.value.identifier)
 			assert (m is not None)
@@ -998,7 +1192,7 @@ class ASTKeywordExprNode(ASTFinalNode):
 		elif (self.keyword.keyword == 'delete'):
 			if (self.value.identifier not in ns): raise SlValidationNotDefinedError(self.value, self, scope=ns.scope)
 			ns.delete(self.value)
-		super().validate(ns)
+		return super().validate_enter(ns)
 
 class ASTKeywordDefNode(ASTFinalNode):
 	keyword: ...
@@ -1044,36 +1238,36 @@ class ASTKeywordDefNode(ASTFinalNode):
 
 		return cls(keyword, name, argdefs, code, lineno=lineno, offset=offset)
 
-	def validate(self, ns): # XXX.
-		super().validate(ns)
-		code_ns = ns.derive(self.code.name)
+	def validate_leave(self, ns): # XXX.
+		super().validate_leave(ns)
+		code_ns = ns.derive(self.code)
 		if (isinstance(self.keyword.keyword, DefArgsKeyword)):
 			for i in self.argdefs:
 				code_ns.define(i, redefine=True)
 				code_ns.values[i.name] = ...
 		self.code.validate(code_ns)
 
-	def optimize(self, ns):
-		super().optimize(ns)
-		code_ns = ns.derive(self.code.name)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
+		code_ns = ns.derive(self.code)
 		if (isinstance(self.keyword.keyword, DefArgsKeyword)):
 			for i in self.argdefs:
 				code_ns.values[i.name] = ...
 		self.code.optimize(code_ns)
 
 class ASTAssignvalNode(ASTNode):
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		if (self.name.identifier not in ns): raise SlValidationNotDefinedError(self.name, self, scope=ns.scope)
 		varsig = Signature.build(self.name, ns)
 		if (self.value is not None):
 			valsig = Signature.build(self.value, ns)
-			if (valsig != varsig and varsig != valsig): raise SlValidationError(f"Assignment of value `{self.value}' of type `{valsig}' to variable `{self.name}' of type `{varsig}'", self.value, self, scope=ns.scope)
+			if (not valsig.matches(varsig) and not varsig.matches(valsig)): raise SlValidationError(f"Assignment of value `{self.value}' of type `{valsig}' to variable `{self.name}' of type `{varsig}'", self.value, self, scope=ns.scope)
 		varsig.flags.modified = True
 		ns.values[self.name] = self.value if (not varsig.modifiers.volatile) else ...
 
-	def optimize(self, ns):
-		super().optimize(ns)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
 		varsig = Signature.build(self.name, ns)
 		varsig.flags.modified = True
 		ns.values[self.name] = self.value if (not varsig.modifiers.volatile) else ...
@@ -1106,16 +1300,19 @@ class ASTVardefNode(ASTFinalNode, ASTAssignvalNode, ASTDefinitionNode):
 
 		return cls(type, name, value, lineno=lineno, offset=offset)
 
-	def validate(self, ns): # XXX.
+	def validate_enter(self, ns): # XXX.
 		if (self.type.type.identifier == 'auto'): self.type.type.identifier = Signature.build(self.value, ns).typename
 		self.flags.optimized_out = False
-		super().validate(ns)
+		return super().validate_enter(ns)
+
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		if (self.value is not None):
 			varsig = Signature.build(self.name, ns)
 			varsig.flags.modified = False
 
-	def optimize(self, ns):
-		super().optimize(ns)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
 		varsig = Signature.build(self.name, ns)
 		self.flags.optimized_out = False
 		if (self.value is not None): varsig.flags.modified = False
@@ -1153,17 +1350,20 @@ class ASTAssignmentNode(ASTFinalNode, ASTAssignvalNode):
 
 		return cls(name, isattr, assignment, inplace_operator, value, lineno=lineno, offset=offset)
 
-	def validate(self, ns): # XXX.
+	def validate_enter(self, ns): # XXX.
 		valsig = Signature.build(self.value, ns)
 		if (self.assignment.special == ':='): ns.define(self.name, valsig, redefine=True)
-		if (self.isattr): return # TODO
-		super().validate(ns)
+		if (self.isattr): return False # TODO
+		return super().validate_enter(ns)
+
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		varsig = Signature.build(self.name, ns)
 		if (varsig.modifiers.const): raise SlValidationError(f"Assignment to const `{self.name}'", self.name, self, scope=ns.scope)
 		if (self.inplace_operator is not None): ns.values[self.name] = ... # TODO folding
 
-	def optimize(self, ns):
-		super().optimize(ns)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
 		if (self.inplace_operator is not None): ns.values[self.name] = ... # TODO folding
 
 class ASTUnpackAssignmentNode(ASTFinalNode, ASTAssignvalNode):
@@ -1196,22 +1396,23 @@ class ASTUnpackAssignmentNode(ASTFinalNode, ASTAssignvalNode):
 
 		return cls(names, assignment, inplace_operator, value, lineno=lineno, offset=offset)
 
-	def validate(self, ns): # XXX.
+	def validate_enter(self, ns): # XXX.
 		valsig = Signature.build(self.value, ns)
 		if (self.assignment.special == ':='):
 			for name, type in zip(self.names, valsig.valtypes):
 				ns.define(name, type, redefine=True)
-		ASTNode.validate(self, ns)
+		self.value.validate(ns)  # here, as what follows checks against `valsig' as it was before the names were redefined; the names and operators have nothing to validate
 		for name, (ii, valtype) in zip(self.names, enumerate(valsig.valtypes)):
 			if (name.identifier not in ns): raise SlValidationNotDefinedError(name, self, scope=ns.scope)
 			varsig = Signature.build(name, ns)
 			if (varsig.modifiers.const): raise SlValidationError(f"Assignment to const `{name}'", name, self, scope=ns.scope)
-			if (varsig != valtype): raise SlValidationError(f"Assignment of `{valtype}' to variable {name} of type {varsig}", self.value.value.values[ii] if (isinstance(self.value, ASTValueNode) and hasattr(self.value.value, 'values')) else name, self, scope=ns.scope)
+			if (not varsig.matches(valtype)): raise SlValidationError(f"Assignment of `{valtype}' to variable {name} of type {varsig}", self.value.value.values[ii] if (isinstance(self.value, ASTValueNode) and hasattr(self.value.value, 'values')) else name, self, scope=ns.scope)
 			varsig.flags.modified = True
 			if (self.inplace_operator is not None): ns.values[name] = ... # TODO folding
+		return False  # the value is validated above, and the checks of `ASTAssignvalNode' are for a single name
 
-	def optimize(self, ns):
-		super().optimize(ns)
+	def optimize_leave(self, ns):
+		super().optimize_leave(ns)
 		if (self.inplace_operator is not None): ns.values[self.name] = ... # TODO folding
 
 class ASTUnaryOperationNode(ASTPrimitiveNode):
@@ -1223,9 +1424,12 @@ class ASTUnaryOperationNode(ASTPrimitiveNode):
 		super().__init__(**kwargs)
 		self.name, self.isattr, self.unary_operator = name, isattr, unary_operator
 
-	def validate(self, ns):
-		if (self.isattr): return # TODO
-		super().validate(ns)
+	def validate_enter(self, ns):
+		if (self.isattr): return False # TODO
+		return super().validate_enter(ns)
+
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		varsig = Signature.build(self.name, ns)
 		if (varsig.modifiers.const): raise SlValidationError(f"Unary operation `{self.unary_operator}' on const `{self.name}'", self.name, self, scope=ns.scope)
 
@@ -1285,9 +1489,9 @@ class ASTAttrsetNode(ASTFinalNode):
 
 		return cls(value, assignment, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
+	def validate_enter(self, ns):
 		assert (self.assignment.isattr)
-		super().validate(ns)
+		return super().validate_enter(ns)
 		# TODO: attr check
 		#valsig = Signature.build(self.value, ns)
 		#if ((self.optype.special, self.attr.identifier) not in valsig.attrops): raise SlValidationError(f"`{valsig}' does not support attribute operation `{self.optype}' with attr `{self.attr}'", self.optype, self, scope=ns.scope)
@@ -1319,19 +1523,19 @@ class ASTFunccallNode(ASTFinalNode):
 
 		return cls(callable, callargs, callkwargs, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
-		super().validate(ns)
+	def validate_leave(self, ns):
+		super().validate_leave(ns)
 		fsig = Signature.build(self.callable, ns)
 		if (not isinstance(fsig, Callable)): raise SlValidationError(f"`{self.callable}' of type `{fsig}' is not callable", self.callable, self, scope=ns.scope)
 		callarguments = CallArguments.build(self, ns)
 		if (fsig.compatible_call(callarguments, ns) is None): raise SlValidationError(f"Parameters `({callarguments})' don't match any of `{self.callable}' signatures:\n{S(fsig.callargssigstr).indent()}\n", self, scope=ns.scope)
 
-	def optimize(self, ns):
+	def optimize_enter(self, ns):
 		fsig = Signature.build(self.callable, ns)
 		if (fsig.code is not None):
-			code_ns = ns.derive(fsig.code.name)
+			code_ns = ns.derive(fsig.code)
 			fsig.code.validate(code_ns)
-		super().optimize(ns)
+		return super().optimize_enter(ns)
 
 class ASTConditionalNode(ASTFinalNode):
 	condition: ...
@@ -1389,16 +1593,16 @@ class ASTForLoopNode(ASTFinalNode):
 
 		return cls(name, iterable, code, lineno=lineno, offset=offset)
 
-	def validate(self, ns):
+	def validate_enter(self, ns):
 		# TODO: validate iterability
 		ns.define(self.name, Signature.build(self.iterable, ns).valtype)
 		ns.weaken(self.name)
 		ns.values[self.name] = ...
-		super().validate(ns)
+		return super().validate_enter(ns)
 
-	def optimize(self, ns):
+	def optimize_enter(self, ns):
 		self.code.validate(ns)
-		super().optimize(ns)
+		return super().optimize_enter(ns)
 
 class ASTWhileLoopNode(ASTFinalNode):
 	code: ...  # needs to be validated/optimized first (case when the condition is modified from loop body)
@@ -1426,13 +1630,13 @@ class ASTWhileLoopNode(ASTFinalNode):
 
 		return cls(condition, code, lineno=lineno, offset=offset)
 
-	#def validate(self, ns):
+	#def validate_enter(self, ns):
 	#	Signature.build(self.condition, ns).modifiers.volatile = True
-	#	super().validate(ns)
+	#	return super().validate_enter(ns)
 
-	def optimize(self, ns):
+	def optimize_enter(self, ns):
 		self.code.validate(ns)
-		super().optimize(ns)
+		return super().optimize_enter(ns)
 
 class ASTElseClauseNode(ASTFinalNode):
 	code: ...
@@ -1458,8 +1662,55 @@ class ASTElseClauseNode(ASTFinalNode):
 
 		return cls(code, lineno=lineno, offset=offset)
 
-def build_ast(code, name=None, *, interactive=False):
-	code = copy.deepcopy(code)
+statement_keywords = {
+	'if': {ASTConditionalNode},
+	'for': {ASTForLoopNode},
+	'while': {ASTWhileLoopNode},
+	'else': {ASTElseClauseNode},
+	'class': {ASTClassdefNode},
+}
+
+identifier_statements = {ASTFuncdefNode, ASTVardefNode, ASTAssignmentNode, ASTUnpackAssignmentNode, ASTUnaryPostOperationNode, ASTAttrsetNode, ASTFunccallNode, ASTExprNode}
+identifier_statements_by_next = {
+	'IDENTIFIER': {ASTFuncdefNode, ASTVardefNode, ASTUnpackAssignmentNode},
+	'OPERATOR': {ASTAssignmentNode, ASTUnpackAssignmentNode, ASTUnaryPostOperationNode, ASTFunccallNode, ASTExprNode},
+	'(': {ASTFunccallNode, ASTExprNode},
+	'[': {ASTFunccallNode, ASTExprNode},
+	'.': {ASTAttrsetNode, ASTFunccallNode, ASTExprNode},
+	'=': {ASTAssignmentNode, ASTUnpackAssignmentNode},
+	':=': {ASTAssignmentNode, ASTUnpackAssignmentNode},
+	',': {ASTUnpackAssignmentNode},
+}
+
+special_statements = {
+	'.': {ASTAssignmentNode, ASTUnaryPostOperationNode, ASTFunccallNode, ASTExprNode},
+	'=': {ASTUnpackAssignmentNode},
+	':=': {ASTUnpackAssignmentNode},
+	'}': set(),
+}
+
+def final_node_candidates(tl):
+	# Narrows the statement types that can start with the leading token(s) of `tl'; None if it can't tell.
+	if (not tl): return None
+	tok = tl[0]
+	if (tok.typename == 'KEYWORD'):
+		if (isinstance(tok.token, Modifier)): return {ASTFuncdefNode, ASTVardefNode}
+		if (isinstance(tok.token, ExprKeyword)): return {ASTKeywordExprNode}
+		if (isinstance(tok.token, DefKeyword)): return {ASTKeywordDefNode}
+		return statement_keywords.get(tok.token)
+	if (tok.typename == 'IDENTIFIER'):
+		if (len(tl) < 2): return identifier_statements
+		nexttok = tl[1]
+		return identifier_statements_by_next.get(nexttok.token if (nexttok.typename == 'SPECIAL') else nexttok.typename, identifier_statements)
+	if (tok.typename == 'OPERATOR'): return {ASTUnaryPreOperationNode, ASTFunccallNode, ASTExprNode}
+	if (tok.typename == 'SPECIAL'): return special_statements.get(tok.token, {ASTFunccallNode, ASTExprNode})
+	return {ASTFunccallNode, ASTExprNode}
+
+def build_ast(code, name=None, *, interactive=False, packrat=True, stats=None):
+	# `stats', if given, is a Counter that gets the number of statements and of the ones that fell back to trying all of the final nodes.
+	if (stats is None): stats = collections.Counter()
+	code = iter(code)
+	pending = collections.deque()
 	root = ASTRootNode.build(name)
 	code_stack = [(root, next(root))]
 	next(root)
@@ -1467,12 +1718,23 @@ def build_ast(code, name=None, *, interactive=False):
 	final_nodes = ASTFinalNode.__subclasses__()
 	if (interactive): final_nodes += (ASTExprNode,)
 
-	for ii, tl in enumerate(code):
+	while (True):
+		if (pending): tl = pending.popleft()
+		else:
+			try: tl = TokenCursor(next(code), memo=({} if (packrat) else None))
+			except StopIteration: break
 		if (not tl): continue
 		lineno, offset = tl[0].lineno, tl[0].offset
 
+		stats['statements'] += 1
+		candidates = final_node_candidates(tl)
+		if (candidates is None): order = final_nodes; stats['fallback'] += 1
+		elif (not candidates and len(code_stack) > 1 and tl[0].typename == 'SPECIAL' and tl[0].token == '}'): order = ()
+		else: order = [*(i for i in final_nodes if i in candidates), None, *(i for i in final_nodes if i not in candidates)]
+
 		err = set()
-		for i in final_nodes:
+		for i in order:
+			if (i is None): stats['fallback'] += 1; continue  # no candidate matched, try the rest for the same result and errors
 			try:
 				c = tl.copy()
 				r = i.build(c)
@@ -1483,8 +1745,8 @@ def build_ast(code, name=None, *, interactive=False):
 					else:
 						assert (r is None)
 						if (c):
-							if (c[-1].typename == 'SPECIAL' and c[-1].token == '}'): code.insert(ii+1, [c.pop()])
-							code.insert(ii+1, c)
+							if (c[-1].typename == 'SPECIAL' and c[-1].token == '}'): pending.appendleft(TokenCursor([c.pop()]))
+							pending.appendleft(c)
 						err.clear()
 						break
 				assert (r is not None)
@@ -1499,7 +1761,7 @@ def build_ast(code, name=None, *, interactive=False):
 				break
 		else:
 			if (len(code_stack) > 1 and tl and tl[0].typename == 'SPECIAL' and tl[0].token == '}'):
-				if (tl[1:]): code.insert(ii+1, tl[1:])
+				if (tl[1:]): pending.appendleft(tl[1:])
 				try: next(code_stack.pop()[0])
 				except StopIteration as ex: code_stack[-1][0].send(ex.value); err.clear()
 				else: raise WTFException()
@@ -1514,11 +1776,197 @@ def build_ast(code, name=None, *, interactive=False):
 	except StopIteration as ex: return ex.value
 
 def walk_ast_nodes(node):
-	if (isiterable(node) and not isinstance(node, str)):
-		for i in node: yield from walk_ast_nodes(i)
-	if (not isinstance(node, ASTNode)): return
-	yield node
-	for i in allslots(node): yield from walk_ast_nodes(getattr(node, i))
+	# pre-order, with an explicit stack so that deeply nested code doesn't hit the recursion limit
+	stack = [iter((node,))]
+	while (stack):
+		for i in stack[-1]:
+			if (isinstance(i, ASTNode)):
+				yield i
+				stack.append(ast_children(i))
+				break
+			elif (isiterable(i) and not isinstance(i, str)): stack.append(iter(i)); break
+		else: stack.pop()
+
+class ASTVisitor(Slots):
+	# Calls `visit_<typename>()' for every node in pre-order and `leave_<typename>()' after its children, the handlers being looked up along the node class's MRO (so `visit_Expr()' also gets binary and unary expressions) and falling back to `visit()' and `leave()'.
+	# A `visit' handler returning False skips the children of its node and its `leave' handler; a `leave' handler returning a node replaces its node in the slot or list holding it.
+
+	handlers = dict()
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls.handlers = dict()
+
+	@classmethod
+	def handler(cls, nodecls, kind='visit'):
+		try: return cls.handlers[kind, nodecls]
+		except KeyError: pass
+		r = cls.handlers[kind, nodecls] = next((getattr(cls, f"{kind}_{i.typename}") for i in nodecls.__mro__ if i is not ASTNode and issubclass(i, ASTNode) and hasattr(cls, f"{kind}_{i.typename}")), getattr(cls, kind))
+		return r
+
+	def visit(self, node):
+		pass
+
+	def leave(self, node):
+		pass
+
+	def children(self, node):
+		# `(owner, key, child)' for each node below `node' to walk into, `owner' being the node or list holding it, or None if it can't be replaced there
+		for i in ast_fields(node):
+			v = getattr(node, i, None)
+			if (isinstance(v, ASTNode)): yield (node, i, v); continue
+			if (not isiterable(v) or isinstance(v, str)): continue
+			stack = [(v, iter(enumerate(v)))]
+			while (stack):
+				owner, it = stack[-1]
+				for k, j in it:
+					if (isinstance(j, ASTNode)): yield (owner if (isinstance(owner, list)) else None, k, j)
+					elif (isiterable(j) and not isinstance(j, str)): stack.append((j, iter(enumerate(j)))); break
+				else: stack.pop()
+
+	def walk(self, node):
+		# → `node', or what replaced it
+		root = [node]
+		stack = [(root, 0, node, None)]
+		while (stack):
+			owner, key, node, children = stack[-1]
+			if (children is None):
+				if (self.handler(type(node))(self, node) is False): stack.pop(); continue
+				children = iter(self.children(node))
+				stack[-1] = (owner, key, node, children)
+			for i in children: stack.append((*i, None)); break
+			else:
+				stack.pop()
+				r = self.handler(type(node), 'leave')(self, node)
+				if (r is None or r is node or owner is None): continue
+				if (isinstance(owner, list)): owner[key] = r
+				else: setattr(owner, key, r)
+		return root[0]
+
+class ASTPass(ASTVisitor):
+	# Runs the `<name>_enter()' and `<name>_leave()' hooks of the nodes in `ns', see `ASTNode.validate()' and `ASTNode.optimize()'.
+	# The code of a callable or a block isn't walked into: its owner passes it in the namespace it derives for it.
+
+	ns: ...
+
+	def __init__(self, ns):
+		self.ns = ns
+
+	def children(self, node):
+		for i in ast_fields(node):
+			v = getattr(node, i, None)
+			if (isinstance(v, ASTNode)):
+				if (not isinstance(v, ASTCodeNode)): yield (node, i, v)
+			elif (isiterablenostr(v)):
+				for jj, j in enumerate(v):
+					if (isinstance(j, ASTNode)): yield (v if (isinstance(v, list)) else None, jj, j)
+
+class ASTValidator(ASTPass):
+	def visit(self, node):
+		return node.validate_enter(self.ns)
+
+	def leave(self, node):
+		node.validate_leave(self.ns)
+
+class ASTOptimizer(ASTPass):
+	def visit(self, node):
+		return node.optimize_enter(self.ns)
+
+	def leave(self, node):
+		return node.optimize_leave(self.ns)
+
+class ASTRelocator(ASTVisitor):
+	# Moves a tree down by `shift' lines and forgets the spans measured for it, for reused or rewritten nodes.
+
+	shift: int
+
+	def __init__(self, shift=0):
+		self.shift = shift
+
+	def visit(self, node):
+		if (self.shift and node.lineno is not None): node.lineno += self.shift
+		node.extent = None
+
+class ASTIdentifierCollector(ASTVisitor):
+	identifiers: list  # in pre-order
+
+	def visit_Identifier(self, node):
+		self.identifiers.append(node.identifier)
+
+class SignatureCache(Slots):
+	# `Signature.build()' results of the expressions built in one namespace tree, shared by validation, optimization and code generation.
+	# Each entry is dropped as soon as something it was built from changes: a binding it looked up (`(id(_Signatures), name)'), a node below it (`id(node)') or the entry of a subexpression (its key).
+
+	entries: dict  # `(id(node), id(ns))' → `(signature, node, ns)', keeping both alive so their ids aren't reused
+	dependents: dict  # dependency → keys of the entries built from it
+	forgotten: int  # number of `forget()' calls, so that a build that saw one isn't stored
+
+	def forget(self, dep):
+		self.forgotten += 1
+		stack = [dep]
+		while (stack):
+			for key in self.dependents.pop(stack.pop(), ()):
+				if (self.entries.pop(key, None) is not None): stack.append(key)
+
+	def clear(self):
+		self.entries.clear()
+		self.dependents.clear()
+
+signature_reads = None  # dependencies of the `Signature.build()' in progress, see `SignatureCache'
+
+def signature_cached(f):
+	# Memoizes `Signature.build()' of the expressions, which are pure given the bindings they look up, in `ns.signature_cache'.
+	cached = {ASTBinaryExprNode, ASTUnaryExprNode, ASTFunccallNode, ASTItemgetNode, ASTAttrgetNode}
+	def decorated(cls, x, ns):
+		global signature_reads
+		outer = signature_reads
+		if (type(x) not in cached):
+			if (outer is not None): outer.add(id(x))
+			return f(cls, x, ns)
+		cache = ns.signature_cache
+		key = (id(x), id(ns))
+		r = cache.entries.get(key)
+		if (r is not None):
+			if (outer is not None): outer.add(key)
+			return r[0]
+		forgotten = cache.forgotten
+		signature_reads = reads = {id(x)}
+		try: r = f(cls, x, ns)
+		except BaseException:
+			if (outer is not None): outer |= reads  # a caller that catches it depends on what made it fail
+			raise
+		finally: signature_reads = outer
+		if (cache.forgotten == forgotten):
+			cache.entries[key] = (r, x, ns)
+			for i in reads: cache.dependents.setdefault(i, set()).add(key)
+			if (outer is not None): outer.add(key)
+		elif (outer is not None): outer |= reads
+		return r
+	return decorated
+
+interned_signatures = dict()  # `(class, *params)' → shared instance, see `intern_signature()'
+interned_params = dict()  # `id(shared instance)' → `(class, params)'
+
+def intern_signature(cls, **params):
+	# The shared instance of `cls(**params)', if all the params are shared signatures themselves. Shared instances must not be modified, see `own_signature()'.
+	key = [cls]
+	for k, v in params.items():
+		vv = v if (isinstance(v, tuple)) else (v,)
+		if (not all(id(i) in interned_params for i in vv)): return cls(**params)
+		key.append((k, *map(id, vv)))
+	key = tuple(key)
+	try: return interned_signatures[key]
+	except KeyError: pass
+	r = interned_signatures[key] = cls(**params)
+	r.hashvalue = hash(key)
+	interned_params[id(r)] = (cls, params)
+	return r
+
+def own_signature(sig):
+	# `sig' itself, or a fresh equal instance if `sig' is shared, so that it can be modified
+	try: cls, params = interned_params[id(sig)]
+	except KeyError: return sig
+	return cls(**params)
 
 class _SignatureBase(ABCSlots): pass
 class Signature(_SignatureBase):
@@ -1526,6 +1974,7 @@ class Signature(_SignatureBase):
 	typename: ...
 	modifiers: paramset
 	flags: paramset
+	hashvalue: None  # set once it's shared, see `intern_signature()'
 
 	@init(typename=..., modifiers=..., flags=...)
 	def __init__(self):
@@ -1542,10 +1991,15 @@ class Signature(_SignatureBase):
 		return self.name
 
 	def __eq__(self, x):
-		return (x is not None and self.typename == x.typename)
+		# exact, so that it agrees with `__hash__()': a shared instance only equals itself, the others equal by typename; type compatibility is `matches()'
+		return (x is self or self.hashvalue is None and isinstance(x, Signature) and x.hashvalue is None and self.typename == x.typename)
 
 	def __hash__(self):
-		return hash(tuple(getattr(self, i) for i in allslots(self)))
+		return (self.hashvalue if (self.hashvalue is not None) else hash(self.typename))
+
+	def matches(self, x):
+		# whether `x' is compatible with this type: the same typename, for the instances not shared too
+		return (x is self or isinstance(x, Signature) and self.typename == x.typename)
 
 	@property
 	def name(self):
@@ -1560,12 +2014,12 @@ class Signature(_SignatureBase):
 		raise KeyError()
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTArgdefNode, ns): # TODO: modifiers
 		return cls.build(x.type, ns)
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTAssignvalNode, ns):
 		r = cls.build(x.type, ns)
 		#ns.signatures[x.name.identifier] = r
@@ -1573,108 +2027,160 @@ class Signature(_SignatureBase):
 		return r
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTTypedefNode, ns):
 		r = cls.build(x.type, ns)
+		if (x.modifiers): r = own_signature(r)
 		r.modifiers.update(x.modifiers)
 		return r
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTValueNode, ns):
 		return cls.build(x.value, ns)
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTLiteralNode, ns):
-		return builtin_names[literal_type(x.literal).__name__]()
+		return intern_signature(builtin_names[literal_type(x.literal).__name__])
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTIdentifierNode, ns):
-		if (x.identifier in builtin_names): return builtin_names[x.identifier]()
+		if (x.identifier in builtin_names): return intern_signature(builtin_names[x.identifier])
 		if (x.identifier not in ns): raise SlValidationNotDefinedError(x, scope=ns.scope)
 		return ns.signatures[x.identifier]
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTListNode, ns):
 		#return Collection(keytype=stdlib.int(), valtype=Signature.build(x.type, ns))
-		return stdlib.list(valtype=Signature.build(x.type, ns))
+		return intern_signature(stdlib.list, valtype=Signature.build(x.type, ns))
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTTupleNode, ns):
 		#return MultiCollection(keytype=stdlib.int(), valtypes=tuple(Signature.build(t if (t is not None) else v, ns) for t, v in zip(x.types, x.values)))
-		return stdlib.tuple(valtypes=tuple(Signature.build(t if (t is not None) else v, ns) for t, v in zip(x.types, x.values)))
+		return intern_signature(stdlib.tuple, valtypes=tuple(Signature.build(t if (t is not None) else v, ns) for t, v in zip(x.types, x.values)))
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTFunccallNode, ns):
 		callarguments = CallArguments.build(x, ns)
 		return cls.build(x.callable, ns).compatible_call(callarguments, ns)[1]
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTLambdaNode, ns):
 		return Lambda.build(x, ns)
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTFuncdefNode, ns):
 		return Function.build(x, ns)
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTClassdefNode, ns):
 		return Class.build(x, ns)
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTKeywordDefNode, ns):
 		return KeywordDef.build(x, ns)
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTUnaryOperationNode, ns):
 		return cls.build(x.name, ns)
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTItemgetNode, ns):
 		return cls.build(x.value, ns).itemget[cls.build(x.key, ns), x.key]
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTAttrgetNode, ns):
 		return cls.build(x.value, ns).attrops[x.optype.special, x.attr.identifier]
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTUnaryExprNode, ns):
 		return cls.build(x.value, ns).operators[x.operator.operator]
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTBinaryExprNode, ns):
 		return cls.build(x.lvalue, ns).operators[x.operator.operator, cls.build(x.rvalue, ns)]
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: _SignatureBase, ns):
 		return x
 
+	build = classmethod(signature_cached(build.__func__))
+
+validation_generation = 0  # bumped by every validation of a module, so that the overloads chosen by `Callable.match_call()' are only kept for one
+
+class OverloadIndex(Slots):
+	# Overloads of a callable bucketed by arity, and the overloads already chosen per argument types in one validation, see `Callable.match_call()'.
+	count: int
+	generation: int
+	by_arity: dict
+	by_args: dict
+
+	def __init__(self, count):
+		self.count, self.generation = count, validation_generation
+
+def signature_key(sig):
+	# what `CallArguments.compatible()' can tell apart of `sig': a shared instance is itself, the others their class and typename, with those of their type parameters
+	if (sig.hashvalue is not None): return sig
+	if (isinstance(sig, MultiCollection)): return (type(sig), sig.typename, *map(signature_key, sig.valtypes))
+	if (isinstance(sig, Collection)): return (type(sig), sig.typename, signature_key(sig.keytype), signature_key(sig.valtype))
+	return (type(sig), sig.typename)
+
 class Callable(Signature):
 	call: ...
 	code: ...
+	overload_index: None
 
 	def __init__(self, *, code=None, **kwargs):
 		super().__init__(**kwargs)
 		self.code = code
 
 	def compatible_call(self, callarguments, ns):
-		try: return first((k, v) for k, v in self.call.items() if callarguments.compatible(k))
-		except StopIteration: return None
+		return self.match_call(self.call, callarguments)
+
+	def overload(self, argdefs, rettype):
+		# → a copy with the overload `argdefs' → `rettype' added, leaving `self' as it was for the namespaces that hold it (such as the states `IncrementalValidator' restores)
+		r = copy.copy(self)
+		r.flags = copy.copy(self.flags)
+		r.call = listmap()
+		for k, v in self.call.items(): r.call[k] = v
+		r.call[argdefs] = rettype
+		r.overload_index = None
+		return r
+
+	def match_call(self, overloads, callarguments):
+		# Tries `overloads' in order of definition, skipping the ones of another arity (without modifiers each argdef takes exactly one positional argument). The result is kept until an overload is added or the next validation starts.
+		if (self.overload_index is None or self.overload_index.count != len(overloads) or self.overload_index.generation != validation_generation): self.overload_index = OverloadIndex(len(overloads))
+		index = self.overload_index
+		nargs = len(callarguments.args) if (not callarguments.starargs) else None
+		try: candidates = index.by_arity[nargs]
+		except KeyError: candidates = index.by_arity[nargs] = tuple(k for k, v in overloads.items() if nargs is None or len(k) == nargs or any(i.modifier is not None for i in k))
+
+		try: key = (nargs, len(callarguments.starargs), bool(callarguments.kwargs), bool(callarguments.starkwargs), *(signature_key(Signature.build(i, callarguments.ns)) for i in callarguments.args))
+		except Exception: key = None  # left for `compatible()' to report
+		else:
+			try: r = index.by_args[key]
+			except KeyError: pass
+			else: return (r, overloads[r]) if (r is not None) else None
+
+		try: r = first(k for k in candidates if callarguments.compatible(k))
+		except StopIteration: r = None
+		if (key is not None): index.by_args[key] = r
+		return (r, overloads[r]) if (r is not None) else None
 
 	@abc.abstractproperty
 	def callargssigstr(self):
@@ -1700,7 +2206,7 @@ class Function(Callable):
 		raise KeyError()
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTFuncdefNode, ns, *, redefine=False):
 		name = x.name.identifier
 		if (name not in ns): fsig = ns.signatures[name] = cls(name=name, code=x.code)
@@ -1709,10 +2215,10 @@ class Function(Callable):
 		argdefs = tuple(x.argdefs)
 		if (not redefine and argdefs in fsig.call and name not in ns.weak): raise SlValidationRedefinedError(x.name, x.__fsig__(), scope=ns.scope)
 		if (x.type.type.identifier == 'auto'): # XXX@ TODO FIXME
-			code_ns = ns.derive(x.code.name)
+			code_ns = ns.derive(x.code)
 			rettype = common_type((i.value for i in x.code.nodes if (isinstance(i, ASTKeywordExprNode) and i.keyword.keyword == 'return')), code_ns) or stdlib.void()
 		else: rettype = Signature.build(x.type, ns)
-		fsig.call[argdefs] = rettype
+		fsig = ns.signatures[name] = fsig.overload(argdefs, rettype)
 		dlog(fsig.call, x)
 		return fsig
 
@@ -1734,12 +2240,12 @@ class Lambda(Callable):
 		raise KeyError()
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTLambdaNode, ns, *, redefine=False):
 		fsig = cls(code=x.code)
 		argdefs = tuple(x.argdefs)
 		if (x.type.type.identifier == 'auto'):
-			code_ns = ns.derive(x.code.name)
+			code_ns = ns.derive(x.code)
 			rettype = common_type((i.value for i in x.code.nodes if (isinstance(i, ASTKeywordExprNode) and i.keyword.keyword == 'return')), code_ns) or stdlib.void()
 		else: rettype = Signature.build(x.type, ns)
 		fsig.call[argdefs] = rettype
@@ -1759,7 +2265,7 @@ class KeywordDef(Callable):
 		return '\n'.join(f"{self.name}({S(', ').join(args)})" for args, ret in self.call.items())
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTKeywordDefNode, ns, *, redefine=False):
 		name = x.name.identifier
 		if (name not in ns): fsig = ns.signatures[name] = cls(name=name, code=x.code)
@@ -1767,7 +2273,7 @@ class KeywordDef(Callable):
 
 		argdefs = tuple(x.argdefs) if (x.argdefs is not None) else ()
 		if (not redefine and argdefs in fsig.call and name not in ns.weak): raise SlValidationRedefinedError(x.name, fsig.call[argdefs], scope=ns.scope)
-		fsig.call[argdefs] = stdlib.void
+		fsig = ns.signatures[name] = fsig.overload(argdefs, stdlib.void)
 		return fsig
 
 class Object(Signature):
@@ -1795,7 +2301,7 @@ class Collection(Object):
 	@itemget
 	@instantiate
 	def itemget(self, keysig, key):
-		if (keysig == self.keytype): return self.valtype
+		if (keysig.matches(self.keytype)): return self.valtype
 		raise KeyError()
 
 class MultiCollection(Collection):
@@ -1809,7 +2315,7 @@ class MultiCollection(Collection):
 	@itemget
 	@instantiate
 	def itemget(self, keysig, key):
-		if (keysig == self.keytype): return self.valtypes[int(key)]
+		if (keysig.matches(self.keytype)): return self.valtypes[int(key)]
 		raise KeyError()
 
 class Class(Object, Callable):
@@ -1827,8 +2333,7 @@ class Class(Object, Callable):
 		return self.name
 
 	def compatible_call(self, callarguments, ns):
-		try: return first((k, v) for k, v in self.constructor.items() if callarguments.compatible(k))
-		except StopIteration: return None
+		return self.match_call(self.constructor, callarguments)
 
 	@property
 	def callargssigstr(self):
@@ -1845,11 +2350,11 @@ class Class(Object, Callable):
 		raise KeyError()
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTClassdefNode, ns, *, redefine=False):
 		name = x.name.identifier
 		#if (not redefine and name in ns and name not in ns.weak): raise SlValidationRedefinedError(x.name, ns.signatures[name], scope=ns.scope)
-		fsig = ns.signatures[name] = cls(name=name, scope=ns.derive(x.code.name), code=x.code)
+		fsig = ns.signatures[name] = cls(name=name, scope=ns.derive(x.code), code=x.code)
 
 		for i in x.code.nodes:
 			if (isinstance(i, ASTKeywordDefNode) and i.keyword.keyword == 'constr'):
@@ -1877,7 +2382,7 @@ class CallArguments(Slots):
 	def __eq__(self, x):
 		return all(getattr(self, i) == getattr(x, i) for i in allslots(self))
 
-	@dispatch
+	@typedispatch
 	def compatible(self, x: typing.Iterable[ASTArgdefNode]):
 		# type(x[i]) = ASTArgdefNode
 		# type(args[i]) = ASTExprNode
@@ -1939,7 +2444,7 @@ class CallArguments(Slots):
 	#	#return sum(len(getattr(self, i)) for i in allslots(self))
 
 	@classmethod
-	@dispatch
+	@typedispatch
 	def build(cls, x: ASTFunccallNode, ns):
 		return cls(args=x.callargs.callargs,
 			   starargs=x.callargs.starargs,
@@ -1951,8 +2456,10 @@ class Namespace(Slots):
 	class _Signatures(Slots):
 		signatures: dict
 		parent: None
+		flat: None  # `(parent view, merged view)', see `flatten()'
+		cache: None  # `SignatureCache' of the namespace tree
 
-		@init(signatures=..., parent=...)
+		@init(signatures=..., parent=..., cache=...)
 		def __init__(self):
 			super().__init__()
 			assert (self.parent not in (self, self.signatures))
@@ -1961,43 +2468,65 @@ class Namespace(Slots):
 		def __iter__(self):
 			return iter(self.keys())
 
-		@dispatch
-		def __contains__(self, x: str):
-			return x in self.signatures or (self.parent is not None and x in self.parent)
-
-		@dispatch
-		def __getitem__(self, x: str):
-			try: return self.signatures[x]
-			except KeyError:
-				if (self.parent is not None):
-					try: return self.parent[x]
-					except KeyError: pass
-				raise
-
-		@dispatch
+		def __contains__(self, x):
+			reads = signature_reads
+			scope = self
+			while (isinstance(scope, Namespace._Signatures)):
+				if (reads is not None): reads.add((id(scope), x))
+				if (x in scope.signatures): return True
+				scope = scope.parent
+			return (scope is not None and x in scope)
+
+		def __getitem__(self, x):
+			reads = signature_reads
+			scope = self
+			while (isinstance(scope, Namespace._Signatures)):
+				if (reads is not None): reads.add((id(scope), x))
+				if (x in scope.signatures): return scope.signatures[x]
+				scope = scope.parent
+			if (scope is None or x not in scope): raise KeyError(x)
+			return scope[x]
+
+		@typedispatch
 		def __setitem__(self, k: str, v: Signature):
+			if (namespace_journal is not None): namespace_journal.write(self.signatures, k)
 			self.signatures[k] = v
+			self.changed(k)
 
-		@dispatch
+		@typedispatch
 		def __delitem__(self, x: ASTIdentifierNode):
 			del self[x.identifier]
 
-		@dispatch
+		@typedispatch
 		def __delitem__(self, x: str):
+			if (namespace_journal is not None): namespace_journal.write(self.signatures, x)
 			del self.signatures[x]
+			self.changed(x)
+
+		def changed(self, k):
+			# outdates the merged view and the signatures built with `k' looked up here
+			self.flat = None
+			if (self.cache is not None): self.cache.forget((id(self), k))
+
+		def flatten(self):
+			# The whole scope chain merged into one dict, rebuilt only after a write to this scope or a change of the parent's view.
+			parent = self.parent.flatten() if (isinstance(self.parent, Namespace._Signatures)) else self.parent
+			if (self.flat is None or self.flat[0] is not parent): self.flat = (parent, {**parent, **self.signatures} if (parent is not None) else self.signatures.copy())
+			return self.flat[1]
 
 		def items(self):
-			return self.signatures.items() if (self.parent is None) else {**self.parent, **self.signatures}.items()
+			return self.flatten().items()
 
 		def keys(self):
-			return self.signatures.keys() if (self.parent is None) else (*self.signatures.keys(), *self.parent.keys())
+			return self.flatten().keys()
 
 		def copy(self):
-			return self.__class__(signatures=self.signatures.copy(), parent=self.parent)
+			return self.__class__(signatures=self.signatures.copy(), parent=self.parent, cache=self.cache)
 
 	class _Values(Slots):
 		values: dict
 		parent: None
+		flat: None  # `(parent view, merged view)', see `flatten()'
 
 		@init(values=..., parent=...)
 		def __init__(self):
@@ -2005,63 +2534,86 @@ class Namespace(Slots):
 			assert (self.parent not in (self, self.values))
 			if (isinstance(self.parent, Namespace._Values)): assert (self.parent.parent not in (self, self.values))
 
-		@dispatch
+		@typedispatch
 		def __getitem__(self, x: ASTLiteralNode):
 			return eval_literal(x)
 
-		@dispatch
+		@typedispatch
 		def __getitem__(self, x: ASTValueNode):
 			return self[x.value]
 
-		@dispatch
+		@typedispatch
 		def __getitem__(self, x: ASTIdentifierNode):
 			return self[x.identifier]
 
-		@dispatch
+		@typedispatch
 		def __getitem__(self, x: str):
-			try: return self.values[x]
-			except KeyError:
-				if (self.parent is not None):
-					try: return self.parent[x]
-					except KeyError: pass
-					#except RecursionError: pass # TODO FIXME XXX! ??? (tests/fib.sl)
-				raise
-
-		@dispatch
+			scope = self
+			while (isinstance(scope, Namespace._Values)):
+				if (x in scope.values): return scope.values[x]
+				scope = scope.parent
+			if (scope is None or x not in scope): raise KeyError(x)
+			return scope[x]
+
+		@typedispatch
 		def __setitem__(self, k, v: ASTValueNode):
 			self[k] = v.value
 
-		@dispatch
+		@typedispatch
 		def __setitem__(self, x: ASTIdentifierNode, v: ASTLiteralNode):
 			self[x.identifier] = eval_literal(v)
 
-		@dispatch
+		@typedispatch
 		def __setitem__(self, x: ASTIdentifierNode, v):
 			self[x.identifier] = v
 
-		@dispatch
+		@typedispatch
 		def __setitem__(self, k: str, v):
-			if (self.parent is None or k in self.values): self.values[k] = v
-			else: self.parent[k] = v
+			d = self.values if (self.parent is None or k in self.values) else self.parent
+			if (namespace_journal is not None): namespace_journal.write(d, k)
+			d[k] = v
+			self.flat = None
 
-		@dispatch
+		@typedispatch
 		def __delitem__(self, x: ASTValueNode):
 			del self[x.value]
 
-		@dispatch
+		@typedispatch
 		def __delitem__(self, x: ASTIdentifierNode):
 			del self[x.identifier]
 
-		@dispatch
+		@typedispatch
 		def __delitem__(self, x: str):
+			if (namespace_journal is not None): namespace_journal.write(self.values, x)
 			del self.values[x]
+			self.flat = None
 
 		def get(self, x):
+			if (isinstance(x, ASTValueNode) and isinstance(x.value, ASTIdentifierNode)): x = x.value
+			if (isinstance(x, ASTIdentifierNode)): x = x.identifier
+			if (isinstance(x, str)):  # the common case, walked here without raising on a miss
+				scope = self
+				while (isinstance(scope, Namespace._Values)):
+					if (x in scope.values): return scope.values[x]
+					scope = scope.parent
+				return scope.get(x) if (scope is not None) else None
 			try: return self[x]
 			except KeyError: return None
 
+		def declare(self, k):
+			# defines `k' in this very scope, not initialized
+			if (namespace_journal is not None): namespace_journal.write(self.values, k)
+			self.values[k] = None
+			self.flat = None
+
+		def flatten(self):
+			# The whole scope chain merged into one dict, rebuilt only after a write to this scope or a change of the parent's view.
+			parent = self.parent.flatten() if (isinstance(self.parent, Namespace._Values)) else self.parent
+			if (self.flat is None or self.flat[0] is not parent): self.flat = (parent, {**parent, **self.values} if (parent is not None) else self.values.copy())
+			return self.flat[1]
+
 		def items(self):
-			return self.values.items() if (self.parent is None) else {**self.parent, **self.values}.items()
+			return self.flatten().items()
 
 		def copy(self):
 			return self.__class__(values=self.values.copy(), parent=self.parent)
@@ -2074,10 +2626,15 @@ class Namespace(Slots):
 	warnclasses: paramset
 	flags: lambda: Sdict(paramset)
 	olevel: int
+	parent: None
+	code: None  # the `ASTCodeNode' it's derived for, which this keeps alive so that its id isn't reused
+	children: dict  # `id(code)' or `(scope, append)' → derived namespace, see `derive()'
+	signature_cache: SignatureCache  # shared with the root
 
-	@init(signatures=..., values=..., weak=..., refcount=..., warnclasses=..., flags=..., olevel=...)
+	@init(signatures=..., values=..., weak=..., refcount=..., warnclasses=..., flags=..., olevel=..., parent=..., code=..., signature_cache=...)
 	def __init__(self, scope):
 		self.scope = scope
+		if (self.signatures.cache is None): self.signatures.cache = self.signature_cache
 
 	def __repr__(self):
 		return f"<Namespace of scope `{self.scope}'>"
@@ -2085,19 +2642,38 @@ class Namespace(Slots):
 	def __contains__(self, x):
 		return x in self.signatures
 
-	@lrucachedfunction
-	def derive(self, scope, *, append=True):
-		assert (type(scope) is str)
+	@typedispatch
+	def derive(self, code: ASTCodeNode):
+		# The scope of `code', created once per code node and living in the scope tree of its root, so validation, optimization and compilation all see the same one, and no two codes of the same name (such as overloads or lambdas) share one.
+		try: r = self.children[id(code)]
+		except KeyError: return self.derive_child(id(code), code.name, code=code)
+		if (namespace_journal is not None): namespace_journal.derive(self, id(code))
+		return r
+
+	@typedispatch
+	def derive(self, scope: str, *, append=True):
+		# A scope keyed by its name, for the ones that have no code node of their own.
+		try: r = self.children[scope, append]
+		except KeyError: return self.derive_child((scope, append), scope, append=append)
+		if (namespace_journal is not None): namespace_journal.derive(self, (scope, append))
+		return r
+
+	def derive_child(self, key, scope, *, code=None, append=True):
 		#return Namespace(signatures=self.signatures.copy(), values=self._Values(parent=self.values), weak=self.weak, scope=self.scope+'.'+scope if (append) else scope)
-		return Namespace(signatures=self.signatures, values=self._Values(parent=self.values), weak=self.weak | set(self.signatures), scope=self.scope+'.'+scope if (append) else scope) # XXX.
-		#return Namespace(signatures=self._Signatures(parent=self.signatures), values=self._Values(parent=self.values), weak=self.weak | set(self.signatures), scope=self.scope+'.'+scope if (append) else scope)
+		r = self.children[key] = Namespace(signatures=self._Signatures(parent=self.signatures), values=self._Values(parent=self.values), weak=self.weak | set(self.signatures), parent=self, code=code, signature_cache=self.signature_cache, scope=self.scope+'.'+scope if (append) else scope)
+		if (namespace_journal is not None): namespace_journal.derive(self, key)
+		return r
+
+	def forget_child(self, key):
+		# drops the scope derived under `key', and with it the ones derived from it, so that it's derived anew
+		self.children.pop(key, None)
 
-	@dispatch
+	@typedispatch
 	def define(self, x: ASTFuncdefNode):
 		self.define(x, redefine=True)
 		self.values[x.name] = ...
 
-	@dispatch
+	@typedispatch
 	def define(self, x: lambda x: hasattr(x, 'name'), sig=None, *, redefine=False):
 		if (redefine):
 			try: del self.signatures[x.name]
@@ -2106,18 +2682,20 @@ class Namespace(Slots):
 			except KeyError: pass
 		self.define(x.name, sig if (sig is not None) else Signature.build(x, self), redefine=redefine)
 
-	@dispatch
+	@typedispatch
 	def define(self, x: ASTIdentifierNode, sig, *, redefine=False):
 		if (not redefine and x.identifier in self and x.identifier not in self.weak): raise SlValidationRedefinedError(x, self.signatures[x.identifier], scope=self.scope)
-		self.signatures[x.identifier] = sig
-		self.values.values[x.identifier] = None
+		self.signatures[x.identifier] = own_signature(sig)  # its flags are set per variable
+		self.values.declare(x.identifier)
+		if (namespace_journal is not None): namespace_journal.weaken(self, x.identifier)
 		self.weak.discard(x.identifier)
 
-	@dispatch
+	@typedispatch
 	def weaken(self, x: ASTIdentifierNode):
+		if (namespace_journal is not None): namespace_journal.weaken(self, x.identifier)
 		self.weak.add(x.identifier)
 
-	@dispatch
+	@typedispatch
 	def delete(self, x: ASTIdentifierNode):
 		ok = bool()
 		try: del self.values[x]
@@ -2126,6 +2704,7 @@ class Namespace(Slots):
 		try: del self.signatures[x.identifier]
 		except KeyError: pass
 		else: ok = True
+		if (namespace_journal is not None): namespace_journal.weaken(self, x.identifier)
 		self.weak.discard(x.identifier)
 		if (not ok): raise SlValidationNotDefinedError(x, scope=self.scope)
 
@@ -2135,6 +2714,251 @@ from .stdlib import builtin_names
 def validate_ast(ast, ns=None):
 	return ast.validate(ns)
 
+namespace_journal = None  # `NamespaceJournal' of the statement being validated by `ValidatedStatement.validate()', written to by the hooks of `Namespace'
+
+class NamespaceJournal(Slots):
+	# What a statement changes at the root of a namespace, recorded by `Namespace' as it happens: the value each key of the root dicts (see `ValidatedStatement.namespace_dicts()') had before its first write, whether each name was weak before its first change, and the scopes of the root it derived or used.
+
+	ns: ...
+	dicts: dict  # `id(dict)' → index
+	before: dict  # `(index, key)' → value
+	weak: dict  # name → whether it was weak
+	children: list
+
+	def __init__(self, ns):
+		self.ns = ns
+		self.dicts = {id(v): ii for ii, v in enumerate(ValidatedStatement.namespace_dicts(ns))}
+
+	def write(self, d, k):
+		ii = self.dicts.get(id(d))
+		if (ii is not None and (ii, k) not in self.before): self.before[ii, k] = d.get(k, ValidatedStatement.unbound)
+
+	def weaken(self, ns, k):
+		if (ns is self.ns and k not in self.weak): self.weak[k] = (k in ns.weak)
+
+	def derive(self, ns, key):
+		if (ns is self.ns and key not in self.children): self.children.append(key)
+
+class ValidatedStatement(Slots):
+	# A top-level statement as validated by `IncrementalValidator' or `check_ast()', with what it saw of the namespace and what it changed there.
+
+	unbound = object()
+
+	fingerprint: ...
+	node: ...
+	deps: ...  # `{name: binding}' of the names it references, as they were before it was validated
+	changes: list  # `[(dict index, key, before, after)]' in the root dicts, see `namespace_dicts()'
+	weak: ...  # `(added, removed)'
+	children: list  # keys of the scopes of the root it derived or used
+
+	def __init__(self, fingerprint, node, deps):
+		self.fingerprint, self.node, self.deps = fingerprint, node, deps
+
+	@staticmethod
+	def namespace_dicts(ns):
+		return (ns.signatures.signatures, ns.values.values, *((ns.values.parent,) if (isinstance(ns.values.parent, dict)) else ()))
+
+	@classmethod
+	def binding(cls, ns, name):
+		return (*(i.get(name, cls.unbound) for i in cls.namespace_dicts(ns)), name in ns.weak)
+
+	def validate(self, ns, *, code=None):
+		# validates the node in `ns' (only its code, in the namespace `code' it's defined in, if given; see `ASTCallableNode.validate_code()'), recording what that changes there, also if it raises
+		global namespace_journal
+		outer = namespace_journal
+		journal = namespace_journal = NamespaceJournal(ns)
+		try: self.node.validate_code(code) if (code is not None) else self.node.validate(ns)
+		finally:
+			namespace_journal = outer
+			dicts, unbound = self.namespace_dicts(ns), self.unbound
+			self.changes = [(ii, k, v, dicts[ii].get(k, unbound)) for (ii, k), v in journal.before.items() if v is not dicts[ii].get(k, unbound)]
+			self.weak = ({k for k, v in journal.weak.items() if not v and k in ns.weak}, {k for k, v in journal.weak.items() if v and k not in ns.weak})
+			self.children = journal.children
+
+	def forget_children(self, ns):
+		for k in self.children: ns.forget_child(k)
+
+	def apply(self, ns, *, undo=False):
+		dicts = self.namespace_dicts(ns)
+		for ii, k, before, after in self.changes:
+			v = before if (undo) else after
+			if (v is self.unbound): dicts[ii].pop(k, None)
+			else: dicts[ii][k] = v
+			if (ii == 0): ns.signatures.changed(k)
+		added, removed = self.weak if (not undo) else self.weak[::-1]
+		ns.weak |= added
+		ns.weak -= removed
+		ns.signatures.flat = ns.values.flat = None
+
+	def reusable(self, ns):
+		return all(all(i is j for i, j in zip(self.binding(ns, k), v)) for k, v in self.deps.items())
+
+class IncrementalValidator(Slots):
+	# Validates successive versions of a module, keeping its namespace. A top-level statement is only validated again if its text changed or a name it references is bound differently than it was the last time; otherwise the node and the effects of the last run are taken over.
+
+	ns: None
+	statements: list  # `ValidatedStatement's of the last run, in order
+	validated: int
+	skipped: int
+
+	def validate(self, ast):
+		global validation_generation
+		validation_generation += 1
+		if (self.ns is None or self.ns.scope != ast.code.name): self.ns, self.statements = Namespace(ast.code.name), []
+		ns = self.ns
+		for i in reversed(self.statements): i.apply(ns, undo=True)
+
+		fingerprints = [(type(node), node.offset, str(node)) for node in ast.code.nodes]
+		counts = collections.Counter(fingerprints)
+		previous = dict()
+		for i in self.statements:
+			candidates = previous.setdefault(i.fingerprint, collections.deque())
+			if (len(candidates) < counts[i.fingerprint]): candidates.append(i)
+			else: i.forget_children(ns)  # no statement can take it over, so its scopes are derived anew
+		self.statements = list()
+		self.validated = self.skipped = 0
+
+		ns.signature_cache.clear()  # the nodes of the last version go
+		try:
+			for ii, (node, fingerprint) in enumerate(zip(ast.code.nodes, fingerprints)):
+				candidates = previous.get(fingerprint)
+				if (candidates and candidates[0].reusable(ns)):
+					st = candidates.popleft()
+					delta = node.lineno - st.node.lineno
+					if (delta): ASTRelocator(delta).walk(st.node)
+					ast.code.nodes[ii] = st.node
+					st.apply(ns)
+					self.skipped += 1
+				else:
+					if (candidates): candidates.popleft().forget_children(ns)  # superseded by `node'
+					identifiers = ASTIdentifierCollector()
+					identifiers.walk(node)
+					st = ValidatedStatement(fingerprint, node, {i: ValidatedStatement.binding(ns, i) for i in identifiers.identifiers})
+					try: st.validate(ns)
+					except BaseException:
+						st.apply(ns, undo=True)
+						st.forget_children(ns)
+						raise
+					self.validated += 1
+				self.statements.append(st)
+		finally:
+			for i in previous.values():  # what's left wasn't taken over, as validation stopped
+				for j in i: j.forget_children(ns)
+			dlog(f"Validated {self.validated} statements, skipped {self.skipped}")
+
+		return ns
+
+deferred_code = None  # list the callables append `(callable, namespace)' to instead of validating their code while a top-level function or class is validated by `check_ast()'
+code_check = None  # `(ns, statements, bodies)' of the running `check_ast()', inherited by its worker processes; `bodies' are `(statement index, callable, namespace)'
+
+def check_ast(ast, *, jobs=None):
+	# Validates `ast' like `validate_ast()', but with the code of the top-level functions and of the methods of the top-level classes checked afterwards in up to `jobs' processes (one per CPU by default), each against the module namespace as it was where the function is defined.
+	# Errors are merged in the order of the source; one that the code of an earlier function might have prevented is left for `validate_ast()' to confirm, so that what's raised doesn't depend on the number of processes and is what `validate_ast()' would raise.
+	# → the module namespace, as `validate_ast()' leaves it
+	global deferred_code, code_check, validation_generation
+	validation_generation += 1
+	ns = Namespace(ast.code.name)
+	statements, bodies, error = list(), list(), None
+	try:
+		for ii, node in enumerate(ast.code.nodes):
+			st = ValidatedStatement(None, node, None)
+			deferred_code = list() if (isinstance(node, (ASTFuncdefNode, ASTClassdefNode))) else None
+			try: st.validate(ns)
+			except Exception as ex: error = ex
+			finally:
+				statements.append(st)
+				bodies += ((ii, *i) for i in deferred_code or ())
+				deferred_code = None
+			if (error is not None): break  # what's deferred so far still comes before it
+
+		code_check = (ns, statements, bodies)
+		if (jobs is None): jobs = os.cpu_count() or 1
+		jobs = min(jobs, len(bodies))
+		if (jobs > 1 and 'fork' in multiprocessing.get_all_start_methods()):
+			with concurrent.futures.ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context('fork')) as pool:
+				outcomes = [i for r in pool.map(check_code_outcomes, (range(i, len(bodies), jobs) for i in range(jobs))) for i in r]
+			checked = None
+		else:
+			checked = check_code(range(len(bodies)))
+			outcomes = [check_code_outcome(*i) for i in checked]
+		outcomes.sort()
+
+		failed = min((p for p, ok, names in outcomes if not ok), default=None)
+		if (failed == 0): raise check_code((0,))[0][1]  # again here, for the exception itself
+		if (failed is not None or (error is not None and bodies) or check_code_seen(statements, bodies, outcomes)): return validate_ast(ast)  # it may be due to the effects of the code of a function before it, which only validating everything in order tells
+		if (error is not None): raise error
+
+		bound = {p for p, ok, names in outcomes if names}
+		if (checked is None and bound): checked = check_code(bound)  # again here, for the changes themselves
+		check_code_apply(ns, statements, bodies, [(p, st) for p, ex, st in checked or () if p in bound])
+		return ns
+	finally: code_check = None
+
+def check_code_seen(statements, bodies, outcomes):
+	# → whether a name that the code of a function bound in the module namespace is referenced by something validated after it, which `validate_ast()' would have validated with that binding
+	reads = [None]*len(statements)
+	for p, ok, names in outcomes:
+		if (not names): continue
+		ii = bodies[p][0]
+		for j in range(ii if (p+1 < len(bodies) and bodies[p+1][0] == ii) else ii+1, len(statements)):
+			if (reads[j] is None): reads[j] = check_reads(statements[j].node)
+			if (not names.isdisjoint(reads[j])): return True
+	return False
+
+def check_reads(node):
+	# → the names validating `node' may look up; its arguments, if it's a callable, are defined before being looked up
+	identifiers = ASTIdentifierCollector()
+	identifiers.walk(node)
+	r = set(identifiers.identifiers)
+	if (isinstance(node, ASTCallableNode) and getattr(node, 'argdefs', None)): r -= {i.name.identifier for i in node.argdefs}
+	return r
+
+def check_code(positions):
+	# → `[(position, exception or None, its `ValidatedStatement')]' for the code of `code_check' bodies at `positions'
+	ns, statements, bodies = code_check
+	r = list()
+	undone = len(statements)
+	try:
+		for p in sorted(positions, reverse=True):
+			ii, node, node_ns = bodies[p]
+			while (undone > ii+1):
+				undone -= 1
+				statements[undone].apply(ns, undo=True)
+			st = ValidatedStatement(None, node, None)
+			try: st.validate(ns, code=node_ns)
+			except Exception as ex: r.append((p, ex, st))
+			else: r.append((p, None, st))
+			st.apply(ns, undo=True)  # the code's own effects are undone, so that no other one sees them
+			st.forget_children(ns)
+	finally:
+		for i in statements[undone:]: i.apply(ns)  # as a worker process may be given more of them
+	return r
+
+def check_code_outcomes(positions):
+	# → `[(position, whether it validated, names bound in the module namespace)]', as that's what a worker process of `check_ast()' can return: the exceptions may not be picklable
+	return [check_code_outcome(*i) for i in check_code(positions)]
+
+def check_code_outcome(p, ex, st):
+	return (p, ex is None, {k for ii, k, before, after in st.changes} if (ex is None) else None)
+
+def check_code_apply(ns, statements, bodies, checked):
+	# makes the changes that the code of the functions made to the module namespace, unless a later statement made its own, as validating everything in order leaves it
+	last = dict()  # `(dict index, key)' or name → the last statement that changed it
+	for ii, st in enumerate(statements):
+		for di, k, before, after in st.changes: last[di, k] = ii
+		for k in (*st.weak[0], *st.weak[1]): last[k] = ii
+	dicts = ValidatedStatement.namespace_dicts(ns)
+	for p, st in sorted(checked, key=lambda x: x[0]):
+		ii = bodies[p][0]
+		for di, k, before, after in st.changes:
+			if (last.get((di, k), -1) > ii): continue
+			if (after is ValidatedStatement.unbound): dicts[di].pop(k, None)
+			else: dicts[di][k] = after
+			if (di == 0): ns.signatures.changed(k)
+		added, removed = st.weak
+		ns.weak |= {k for k in added if last.get(k, -1) <= ii}
+		ns.weak -= {k for k in removed if last.get(k, -1) <= ii}
+
 class SlNodeException(Exception, ABCSlots):
 	node: ...
 	ctxnode: ...
@@ -2149,24 +2973,26 @@ class SlNodeException(Exception, ABCSlots):
 		l = lstripcount(line)[0]
 
 		ctx = self.ctxnode
-		minlineno = min((getattr(ctx, i).lineno for i in allslots(ctx) if getattr(getattr(ctx, i), 'lineno', 0) > 0), default=min(ctx.lineno, self.lineno))
-		maxlineno = max((getattr(ctx, i).lineno for i in allslots(ctx) if getattr(getattr(ctx, i), 'lineno', 0) > 0), default=max(ctx.lineno, self.lineno))
-		minoffset = min((getattr(ctx, i).offset for i in allslots(ctx) if getattr(getattr(ctx, i), 'offset', -1) >= 0 and getattr(getattr(ctx, i), 'lineno') == self.lineno), default=self.node.offset)
-		maxoffsetlength, maxoffset = max(((getattr(ctx, i).length, getattr(ctx, i).offset) for i in allslots(ctx) if getattr(getattr(ctx, i), 'offset', -1) >= 0 and getattr(getattr(ctx, i), 'lineno') == self.lineno), default=(self.node.length, self.node.offset))
+		parts = [getattr(ctx, i) for i in ast_fields(ctx)]
+		online = [i for i in parts if getattr(i, 'offset', -1) >= 0 and getattr(i, 'lineno') == self.lineno]
+		minlineno = min((i.lineno for i in parts if getattr(i, 'lineno', 0) > 0), default=min(ctx.lineno, self.lineno))
+		maxlineno = max((i.lineno for i in parts if getattr(i, 'lineno', 0) > 0), default=max(ctx.lineno, self.lineno))
+		minoffset = min((i.offset for i in online), default=self.node.offset)
+		maxoffsetlength, maxoffset = max(((i.length, i.offset) for i in online), default=(self.node.length, self.node.offset))
 
 		loff = min((lstripcount(i)[0] for i in self.srclines[minlineno-1:maxlineno]), default=0)
-		srclines = tuple(i[loff:] for i in self.srclines)
-		line, srclines = line[loff:].expandtabs(TAB_SIZE), tuple(i.expandtabs(TAB_SIZE) for i in srclines)
+		srclines = lambda start, stop, loff=loff: tuple(i[loff:].expandtabs(TAB_SIZE) for i in self.srclines[start:stop])  # only the lines shown, not the whole file
+		line = line[loff:].expandtabs(TAB_SIZE)
 
 		loff = lstripcount(line)[0]
 
 		return (f'\033[2m(in {self.scope})\033[0m ' if (self.scope is not None) else '')+\
 			f"{self.__exline__()} {self.at}"+(':\n'+\
-			'\033[1m'+('  '+'\n  '.join(srclines[minlineno-1:self.lineno-1])+'\n' if (minlineno < self.lineno) else '')+\
+			'\033[1m'+('  '+'\n  '.join(srclines(minlineno-1, self.lineno-1))+'\n' if (minlineno < self.lineno) else '')+\
 			'  '+line[:minoffset-l]+'\033[91m'*(self.node.offset >= 0)+line[minoffset-l:maxoffset+maxoffsetlength]+'\033[0m'+line[maxoffset+maxoffsetlength:]+'\033[0m\n'+\
 			'\033[95m'+' '*(2+loff+minoffset-l)+'~'*(self.node.offset-minoffset)+'^'+'~'*(maxoffset+maxoffsetlength-(2+loff+minoffset-l)-(self.node.offset-minoffset)+1)+\
-			('\n\033[0;91m  '+'\n  '.join(srclines[self.lineno:maxlineno]) if (maxlineno > self.lineno and len(srclines) > self.lineno) else '')+\
-			'\033[0m' if (srclines) else '')+\
+			('\n\033[0;91m  '+'\n  '.join(srclines(self.lineno, maxlineno)) if (maxlineno > self.lineno and len(self.srclines) > self.lineno) else '')+\
+			'\033[0m' if (self.srclines) else '')+\
 			self.__exsubline__()+\
 			(f"\n\n\033[1;95mCaused by:\033[0m\n{self.__cause__ if (isinstance(self.__cause__, (SlSyntaxException, SlNodeException))) else ' '+str().join(traceback.format_exception(type(self.__cause__), self.__cause__, self.__cause__.__traceback__))}" if (self.__cause__ is not None) else '')
 
@@ -2205,6 +3031,9 @@ class SlValidationRedefinedError(SlValidationError):
 	def __init__(self, identifier, definition, *args, **kwargs):
 		super().__init__(f"`{identifier}' redefined (defined as `{definition}')", identifier, *args, **kwargs)# at lineno {definition.lineno}
 
-def optimize_ast(ast, ns, level=DEFAULT_OLEVEL): return ast.optimize(ns)
+def optimize_ast(ast, ns, level=DEFAULT_OLEVEL):
+	r = ast.optimize(ns)
+	ASTRelocator().walk(ast)  # spans measured before optimization may be outdated
+	return r
 
 # by Sdore, 2021
@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+# Slang benchmarks
+
+import time, tracemalloc
+from ..tests import *
+from utils import *
+
+def corpus(lines, *, accept=lambda src: True):
+	# The test programs that `accept(src)', one after another and over again until there are at least `lines' lines
+	sources = [src.rstrip('\n')+'\n\n' for name, src in test_sources() if accept(src)]
+	r, n = list(), 0
+	while (n < lines):
+		for i in sources:
+			r.append(i)
+			n += i.count('\n')
+	return str().join(r)
+
+def timed(f, *args, repeat=3, **kwargs):
+	# → `(best time of `repeat' calls in seconds, result of the last one)'
+	t = inf
+	for _ in range(repeat):
+		start = time.perf_counter()
+		r = f(*args, **kwargs)
+		t = min(t, time.perf_counter()-start)
+	return (t, r)
+
+def traced(f, *args, **kwargs):
+	# → `(peak of memory allocated during the call in bytes, result)'
+	tracemalloc.start()
+	try:
+		r = f(*args, **kwargs)
+		return (tracemalloc.get_traced_memory()[1], r)
+	finally: tracemalloc.stop()
+
+def run(main):
+	# calls `main()' with the integer command line arguments, for `python3 -m Slang.benchmarks.<name> [args]'
+	exit(main(*map(int, sys.argv[1:])))
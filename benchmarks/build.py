@@ -0,0 +1,17 @@
+#!/usr/bin/python3
+# Slang AST building benchmark
+
+from . import *
+from ..ast import *
+
+def builds(src):
+	return outcome(lambda: build_ast(parse_string(src), 'test'))[0]
+
+def main(lines=2000):
+	src = corpus(lines, accept=builds)
+	code = parse_string(src)
+	t, ast = timed(build_ast, code, 'test', repeat=1)
+	peak, ast = traced(build_ast, code, 'test')
+	report(f"{src.count(chr(10))} lines", statements=len(code), tokens=sum(map(len, code)), seconds=t, peak_mib=peak/2**20)
+
+if (__name__ == '__main__'): run(main)
@@ -0,0 +1,20 @@
+#!/usr/bin/python3
+# Slang benchmark of the parallel checking of function code
+
+from . import *
+from ..ast import *
+
+def module(n, body=20):
+	# `n' top-level functions with `body' statements of code each, and a `main' calling them
+	code = lambda i: ''.join(f"\tint v{j} = x + {j} * a{i}\n" for j in range(body))
+	return ''.join(f"int a{i} = {i}\nint f{i}(int x) {{\n{code(i)}\treturn v{body-1}\n}}\n" for i in range(n))+'main {\n'+''.join(f"\tstdio.println(f{i}({i}))\n" for i in range(n))+'}\n'
+
+def main(n=200):
+	src = module(n)
+	tv, _ = timed(validate_ast, build_ast(parse_string(src), 'bench'), repeat=1)
+	results = {'validate_ast': tv}
+	for jobs in sorted({1, 2, 4, os.cpu_count() or 1}):
+		results[f"check_ast_{jobs}"], _ = timed(check_ast, build_ast(parse_string(src), 'bench'), jobs=jobs, repeat=1)
+	report(f"{n} functions", **results)
+
+if (__name__ == '__main__'): run(main)
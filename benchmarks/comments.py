@@ -0,0 +1,27 @@
+#!/usr/bin/python3
+# Slang benchmark of parsing comment-heavy code
+
+from . import *
+from .build import builds
+from ..ast import *
+
+def commented(src):
+	# `src' with a comment line before every line and a block comment before every statement of the top level
+	r = list()
+	for i in src.split('\n'):
+		indent = i[:len(i)-len(i.lstrip())]
+		r.append(f"{indent}# {i.strip() or 'blank line'}")
+		if (i and not indent): r.append(f"#| a block comment\n   over two lines |#")
+		r.append(i)
+	return '\n'.join(r)
+
+def parse(src):
+	return build_ast(parse_string(src), 'test')
+
+def main(lines=2000):
+	src = corpus(lines, accept=lambda src: builds(src) and builds(commented(src)))
+	for name, i in (('plain', src), ('commented', commented(src))):
+		t, ast = timed(parse, i, repeat=1)
+		report(name, lines=i.count('\n'), comment_lines=sum(j.lstrip()[:1] == '#' for j in i.split('\n')), seconds=t)
+
+if (__name__ == '__main__'): run(main)
@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+# Slang benchmark of overload dispatch: the per-call cost of `typedispatch()'
+
+from . import *
+from .namespace import per_call
+from ..ast import *
+
+# the same overload set under both decorators: two type overloads and a predicate one
+
+@dispatch
+def by_utils(x: int): return x
+
+@dispatch
+def by_utils(x: str): return x
+
+@dispatch
+def by_utils(x: lambda x: isinstance(x, list)): return x
+
+@typedispatch
+def by_table(x: int): return x
+
+@typedispatch
+def by_table(x: str): return x
+
+@typedispatch
+def by_table(x: lambda x: isinstance(x, list)): return x
+
+def resolving(module, qualname, *args):
+	# a call of the `typedispatch()' overload set `qualname' of `module' that chooses the overload anew, as if it had no table
+	dispatcher, overloads, table = dispatch_registry[module, qualname]
+	return lambda: dispatch_resolve(dispatcher, overloads, args, {})[0](*args)
+
+def calls():
+	# `(name, typedispatch() call, call resolved every time, utils.dispatch() call or None)'
+	ast = build_ast(parse_string("int a = 1\n"), 'bench')
+	ns = validate_ast(ast)
+	name = ast.code.nodes[0].name
+	return (
+		('type overload', lambda: by_table(1), resolving(__name__, 'by_table', 1), lambda: by_utils(1)),
+		('predicate overload', lambda: by_table([]), resolving(__name__, 'by_table', []), lambda: by_utils([])),
+		('Signature.build(identifier)', lambda: Signature.build(name, ns), resolving(Signature.__module__, 'Signature.build', Signature, name, ns), None),
+		("ns.values['a']", lambda: ns.values[name], resolving(Signature.__module__, 'Namespace._Values.__getitem__', ns.values, name), None),
+	)
+
+def main(n=20000):
+	for name, *l in calls():
+		report(name, **{k: f"{per_call(f, n)*1e6:.2f}us" for k, f in zip(('typedispatch', 'resolved', 'utils_dispatch'), l) if f is not None})
+
+if (__name__ == '__main__'): run(main)
@@ -0,0 +1,20 @@
+#!/usr/bin/python3
+# Slang benchmark of incremental validation
+
+from . import *
+from ..ast import *
+
+def module(n, edit=0):
+	# `n' top-level variables and functions, the middle function's result changed by `edit'; only its own statement is validated again
+	return '\n'.join(f"int a{i} = {i}\nint f{i}(int x) = x + a{i} + {edit if (i == n//2) else 0}" for i in range(n))+'\n'
+
+def main(n=1000):
+	for k in (n//4, n//2, n):
+		src, edited = module(k), module(k, 1)
+		tf, _ = timed(validate_ast, build_ast(parse_string(src), 'bench'), repeat=1)
+		v = IncrementalValidator()
+		ti, _ = timed(v.validate, build_ast(parse_string(src), 'bench'), repeat=1)
+		te, _ = timed(v.validate, build_ast(parse_string(edited), 'bench'), repeat=1)
+		report(f"{2*k} statements", validate_ast=tf, first_run=ti, after_edit=te, validated=v.validated, skipped=v.skipped)
+
+if (__name__ == '__main__'): run(main)
@@ -0,0 +1,16 @@
+#!/usr/bin/python3
+# Slang lexer benchmark
+
+from . import *
+from ..lexer import *
+
+def lexes(src):
+	return outcome(parse_string, src)[0]
+
+def main(lines=5000):
+	src = corpus(lines, accept=lexes)
+	for reader in (read_token, match_token):
+		t, r = timed(parse_string, src, reader=reader)
+		report(reader.__name__, lines=src.count('\n'), statements=len(r), seconds=t)
+
+if (__name__ == '__main__'): run(main)
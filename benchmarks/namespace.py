@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+# Slang namespace lookup benchmark
+
+from . import *
+from ..ast import *
+
+def namespaces(width, depth):
+	# `(module, innermost)': a module of `width' variables and a scope nested `depth' levels into it
+	ns = validate_ast(build_ast(parse_string('\n'.join(f"int a{i} = {i}" for i in range(width))), 'bench'))
+	inner = ns
+	for i in range(depth): inner = inner.derive(f"f{i}")
+	return (ns, inner)
+
+def lookups(ns, name):
+	# `(name, operation)' of the lookups done while validating and completing, on `ns'
+	def miss():
+		try: ns.values['undefined']
+		except KeyError: pass
+	return (
+		('signature', lambda: ns.signatures[name]),
+		('contains', lambda: name in ns.signatures),
+		('value', lambda: ns.values[name]),
+		('miss', miss),
+		('keys', lambda: len(ns.signatures.keys())),
+		('items', lambda: len(ns.signatures.items())),
+	)
+
+def per_call(f, n):
+	def loop():
+		for _ in range(n): f()
+	return timed(loop)[0]/n
+
+def main(width=2000, depth=50, n=20000):
+	for name, (module, inner) in (('wide module', namespaces(width, 0)), ('deep nesting', namespaces(10, depth))):
+		report(f"{name} ({width if (inner is module) else depth})", **{k: f"{per_call(f, n if (k not in ('keys', 'items')) else n//100)*1e6:.2f}us" for k, f in lookups(inner, 'a0')})
+
+if (__name__ == '__main__'): run(main)
@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+# Slang parser benchmark
+
+from . import *
+from ..ast import *
+
+def expressions(n):
+	# `(name, source)' of expressions with `n' operands
+	return (
+		('a0 + a1 + ...', ' + '.join(f"a{i}" for i in range(n))),
+		('a0 * b0 + a1 * b1 + ...', ' + '.join(f"a{i} * b{i}" for i in range(n//2))),
+		('-a0 - -a1 - ...', ' - '.join(f"-a{i}" for i in range(n))),
+		('a0 + b0 * 2 == c0 && ...', ' && '.join(f"a{i} + b{i} * 2 == c{i}" for i in range(n//3))),
+		('(a0 + b0) * (a1 + b1) * ...', ' * '.join(f"(a{i} + b{i})" for i in range(n//8))),
+		('f(f(...f(a0)...))', 'f('*(n//8)+'a0'+')'*(n//8)),
+	)
+
+def build_expr(tl):
+	tl = TokenCursor(tl, memo={})
+	r = ASTExprNode.build(tl)
+	assert (not tl)
+	return r
+
+def main(operands=400):
+	for name, src in expressions(operands):
+		tl = parse_string(src)[0]
+		t, r = timed(build_expr, tl)
+		report(name, operands=sum(i.typename in ('IDENTIFIER', 'LITERAL') for i in tl), seconds=t)
+
+if (__name__ == '__main__'): run(main)
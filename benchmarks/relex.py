@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+# Slang incremental relexing benchmark
+
+import random
+from . import *
+from .lexer import lexes
+from ..lexer import *
+
+def main(lines=20000, edits=200, seed=0):
+	# single-character edits at random places of a large file: typing a character into a word and deleting it again
+	rnd = random.Random(seed)
+	src = corpus(lines, accept=lexes)
+	table = TokenTable(src)
+	full, _ = timed(TokenTable, src, repeat=1)
+	words = [i.start()+1 for i in re.finditer(r'(?<!\w)[A-Za-z_]\w+', src)]
+	positions = [rnd.choice(words) for _ in range(edits)]
+	start = time.perf_counter()
+	for i in positions:
+		table.edit(i, i, 'x')
+		table.edit(i, i+1, '')
+	t = (time.perf_counter()-start)/(2*edits)
+	assert (table.src == src and [[(j.type, j.token, j.lineno, j.offset) for j in i] for i in table] == [[(j.type, j.token, j.lineno, j.offset) for j in i] for i in TokenTable(src)])
+	report(f"{src.count(chr(10))} lines", full_relex=full, edit=t, speedup=f"{full/t:.0f}x")
+
+if (__name__ == '__main__'): run(main)
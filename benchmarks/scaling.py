@@ -0,0 +1,20 @@
+#!/usr/bin/python3
+# Slang lexer scaling benchmark
+
+from . import *
+from .lexer import lexes
+from ..lexer import *
+
+def main(lines=100000):
+	# lexing time per line should stay about the same as the input grows
+	for i in (lines//8, lines//4, lines//2, lines):
+		src = corpus(i, accept=lexes)
+		n = src.count('\n')
+		with tempfile.NamedTemporaryFile('w', suffix='.sl') as f:
+			f.write(src)
+			f.flush()
+			tr, src = timed(lambda: read_source(open(f.name)))  # read from the file
+		t, r = timed(parse_string, src)
+		report(f"{n} lines", read=tr, lex=t, us_per_line=t/n*1e6)
+
+if (__name__ == '__main__'): run(main)
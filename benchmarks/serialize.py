@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+# Slang AST serialization benchmark: the binary format against pickle
+
+import gc, pickle
+from . import *
+from .build import builds
+from ..serialize import *
+
+def dump(x):
+	# the tree below `x' as nested tuples of every slot, lineno/offset/flags included, for comparing by value
+	if (isinstance(x, ASTNode)): return (type(x).__name__, *((i, dump(getattr(x, i))) for i in allslots(x) if hasattr(x, i) and i != 'extent'))
+	if (isinstance(x, (set, frozenset))): return (type(x).__name__, *sorted(map(dump, x)))
+	if (isiterable(x) and not isinstance(x, str)): return (type(x).__name__, *map(dump, x))
+	return (type(x).__name__, x)
+
+def paused(loads):
+	# `loads()' with the garbage collector off, as `load_ast()' does
+	def decorated(data):
+		gc.disable()
+		try: return loads(data)
+		finally: gc.enable()
+	return decorated
+
+def main(lines=5000):
+	src = corpus(lines, accept=builds)
+	ast = build_ast(parse_string(src), 'test')
+	expected = dump(ast)  # before anything is serialized, as this fills in the cached `extent' of the nodes
+	for name, dumps, loads in (
+		('pickle', lambda x: pickle.dumps(x, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+		('binary', serialize_ast, deserialize_ast),
+		('pickle, gc paused', lambda x: pickle.dumps(x, protocol=pickle.HIGHEST_PROTOCOL), paused(pickle.loads)),
+		('binary, gc paused', serialize_ast, paused(deserialize_ast)),
+	):
+		dt, data = timed(dumps, ast)
+		lt, r = timed(loads, data)
+		assert (dump(r) == expected)
+		report(name, lines=src.count('\n'), kib=len(data)/1024, dump=dt, load=lt)
+
+if (__name__ == '__main__'): run(main)
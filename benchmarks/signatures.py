@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+# Slang benchmark of building the signatures of expressions: validation and code generation
+
+from . import *
+from ..ast import *
+
+def source(n, width=6):
+	# a function of `n' local variables, each defined by a wide expression of the previous one
+	expr = ' + '.join(f"(a*b - {j}) * (b + a*{j})" for j in range(width))
+	return '\n'.join((
+		"int a = 1",
+		"int b = 2",
+		"int f(int x) {",
+		"\tint v0 = x",
+		*(f"\tint v{i+1} = {expr} + v{i}" for i in range(n)),
+		f"\treturn v{n}",
+		"}",
+		"main {",
+		"\tstdio.println(f(3))",
+		"}",
+	))+'\n'
+
+class OperandLookups(ASTVisitor):
+	# what a backend asks while generating the code of a function: the signatures of the operands of every binary expression
+	ns: ...
+
+	def __init__(self, ns):
+		self.ns = ns
+
+	def visit_BinaryExpr(self, node):
+		Signature.build(node.lvalue, self.ns)
+		Signature.build(node.rvalue, self.ns)
+
+def codegen(ast, ns):
+	for i in ast.code.nodes:
+		if (isinstance(i, ASTFuncdefNode)): OperandLookups(ns.derive(i.code)).walk(i.code)
+
+def main(n=40):
+	src = source(n)
+	ast = build_ast(parse_string(src), 'bench')
+	tv, ns = timed(validate_ast, ast)
+	tc, _ = timed(codegen, ast, ns, repeat=1)  # once, as the signatures cached by it would be reused by the next call
+	report(f"{n} locals", validate=tv, codegen_lookups=tc)
+
+if (__name__ == '__main__'): run(main)
@@ -0,0 +1,21 @@
+#!/usr/bin/python3
+# Slang long statement parsing benchmark
+
+from . import *
+from ..ast import *
+
+def statements(n):
+	# `(name, source)' of single statements with `n' items
+	return (
+		('f(a0, ..., an)', f"f({', '.join(f'a{i}' for i in range(n))})"),
+		('x = [int: 0, ..., n]', f"x = [int: {', '.join(map(str, range(n)))}]"),
+		('g(h(a0, 0), ..., h(an, n))', f"g({', '.join(f'h(a{i}, {i})' for i in range(n//4))})"),
+	)
+
+def main(items=400):
+	for name, src in statements(items):
+		code = parse_string(src)
+		t, r = timed(build_ast, code, repeat=1)
+		report(name, tokens=len(code[0]), seconds=t)
+
+if (__name__ == '__main__'): run(main)
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+# Slang parse cache
+
+import gc, struct, hashlib
+from .ast import *
+from .serialize import *
+from utils import *
+
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'Slang')  # `--no-cache' turns the cache off
+CACHE_SIZE = 256*1024*1024  # bytes; least recently used entries are removed above that
+
+cache_errors = (ValueError, EOFError, struct.error)  # what reading a damaged entry raises, see `ASTReader'
+
+cache_size = None  # estimated size of the entries in bytes, see `store_ast()'
+
+@functools.lru_cache(maxsize=None)
+def parser_version():
+	# only hashed on the first use, so `--no-cache' doesn't read the sources
+	return hashlib.sha256(b'\0'.join(open(os.path.join(os.path.dirname(__file__), i), 'rb').read() for i in ('tokens.py', 'lexer.py', 'ast.py', 'stdlib.py', 'serialize.py'))).digest()
+
+def cache_key(src, name):
+	# `src' is the source text or an iterable of its chunks.
+	h = hashlib.sha256(parser_version())
+	h.update(str(name).encode()+b'\0')
+	for i in ((src,) if (isinstance(src, str)) else src): h.update(i.encode())
+	return h.hexdigest()
+
+def cache_path(key):
+	return os.path.join(CACHE_DIR, key+'.ast')
+
+def load_ast(key):
+	path = cache_path(key)
+	try:
+		with open(path, 'rb') as f: data = f.read()
+	except OSError: return None
+	gcenabled = gc.isenabled()
+	gc.disable()  # reading only allocates, and collecting the growing tree over and over would take most of the time
+	try: ast = deserialize_ast(data)
+	except cache_errors:
+		try: os.remove(path)
+		except OSError: pass
+		return None
+	finally:
+		if (gcenabled): gc.enable()
+	if (not isinstance(ast, ASTRootNode)): return None
+	try: os.utime(path)
+	except OSError: pass
+	return ast
+
+def store_ast(key, ast):
+	global cache_size
+	try: data = serialize_ast(ast)
+	except RecursionError: return False  # too deep to be written; it's just parsed again the next time
+	try:
+		os.makedirs(CACHE_DIR, exist_ok=True)
+		with tempfile.NamedTemporaryFile('wb', dir=CACHE_DIR, suffix='.tmp', delete=False) as f: f.write(data)
+		try: os.replace(f.name, cache_path(key))
+		except OSError: os.remove(f.name); raise
+	except OSError: return False
+	if (cache_size is not None): cache_size += len(data)  # the directory is only scanned again once the estimate passes the limit
+	if (cache_size is None or cache_size > CACHE_SIZE): cache_size = prune_cache()
+	return True
+
+def prune_cache(size=CACHE_SIZE):
+	# → the size left, or `None' if it's unknown
+	try: entries = [(i.stat().st_mtime, i.stat().st_size, i.path) for i in os.scandir(CACHE_DIR) if i.name.endswith('.ast')]
+	except OSError: return None
+	total = sum(i[1] for i in entries)
+	for mtime, fsize, path in sorted(entries):
+		if (total <= size): break
+		try: os.remove(path)
+		except OSError: continue
+		total -= fsize
+	return total
+
+def clear_cache():
+	global cache_size
+	cache_size = prune_cache(0)
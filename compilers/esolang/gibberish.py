@@ -23,38 +23,38 @@ class Instrs:
 		self.ns, self.stack, self.functions = ns, stack, functions
 		self.code = bytearray()
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTRootNode):
 		self.add(x.code)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTCodeNode):
 		for i in x.nodes:
 			self.add(i)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTVardefNode):
 		if (x.value is not None):
 			self.load(x.value)
 			self.stack[-1] = Signature.build(x, self.ns)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTAssignmentNode):
 		sig = Signature.build(x.name, self.ns)
 		for ii, i in enumerate(self.stack):
-			if (i == sig): self.stack[ii] = None
+			if (i is not None and i.matches(sig)): self.stack[ii] = None
 		self.load(x.value)
 		self.stack[-1] = sig
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTFunccallNode):
 		self.load(x)
 		self.code += b'ev'
 		self.stack.pop()
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTFuncdefNode):
-		code_ns = self.ns.derive(x.name.identifier)
+		code_ns = self.ns.derive(x.code)
 		if (x.name.identifier == 'main'):
 			assert not x.argdefs
 			name = x.name.identifier
@@ -64,13 +64,13 @@ class Instrs:
 		#dlog(f"{x.__fsig__()} instrs:\n"+'\n'.join(f_instrs.instrs)+'\n')
 		self.functions[name] = f_instrs
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTKeywordExprNode):
 		if (x.keyword.keyword == 'return'):
 			self.load(x.value)
 		else: raise NotImplementedError(x.keyword)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTLiteralNode):
 		s = str(eval(str(x.literal))).encode().split(b']')
 		if (s):
@@ -80,7 +80,7 @@ class Instrs:
 		if (issubclass(literal_type(x.literal), (int, float))): self.code += b'ei'
 		self.stack.append(None)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTIdentifierNode):
 		dlog(self.stack)
 		sig = Signature.build(x, self.ns)
@@ -88,11 +88,11 @@ class Instrs:
 		self.code += (b'[%d]eip' if (i >= 10) else b'%dep') % i
 		self.stack.append(sig)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTValueNode):
 		self.load(x.value)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTFunccallNode):
 		assert not (x.callargs.starargs or x.callkwargs.callkwargs or x.callkwargs.starkwargs)
 		if (x.callable.value.identifier == 'print'):
@@ -112,7 +112,7 @@ class Instrs:
 			self.stack.pop()
 		self.code += self.functions[f"{x.callable.value.identifier}__{self.ns.signatures[x.callable.value.identifier].call.index(CallArguments.build(x, self.ns))}" if (isinstance(x.callable, ASTValueNode) and isinstance(x.callable.value, ASTIdentifierNode) and x.callable.value.identifier in self.ns.signatures) else x.callable.value.identifier].code#.join((b'{', b'}'))
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTBinaryExprNode):
 		self.load(x.lvalue)
 		self.load(x.rvalue)
@@ -59,16 +59,16 @@ class Instrs:
 	#def syscall(self, rax, rdi=None, rsi=None, rdx=None, r10=None, r8=None, r9=None):
 	#	self.instrs.append("
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTRootNode):
 		self.add(x.code)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTCodeNode):
 		for i in x.nodes:
 			self.add(i)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTVardefNode):
 		name = x.name.identifier
 		try:
@@ -78,7 +78,7 @@ class Instrs:
 		self.varsize[name] = self.sizeof(x.type)
 		if (x.value is not None): self.set(x.name, x.value)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTFunccallNode):
 		callarguments = CallArguments.build(x, self.ns)
 		fsig = Signature.build(x.callable, self.ns)
@@ -103,15 +103,15 @@ class Instrs:
 
 		self.instrs.append(f"call {fname}")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTValueNode, *reg):
 		return self.load(x.value, *reg)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTLiteralNode):
 		return x.literal
 
-	@dispatch
+	@typedispatch
 	def load(self, x):
 		with self.regs(1) as (reg,):
 			self.load(x, reg)
@@ -121,32 +121,32 @@ class Instrs:
 		#self.load(x, reg)
 		#return reg
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTIdentifierNode, reg):
 		self.instrs.append(f"mov {reg}, {self.var(x.identifier)}")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTBinaryExprNode, reg):
 		self.load(x.lvalue, reg)
 		self.instrs.append(f"{self.binopmap[x.operator.operator]} {reg}, {self.load(x.rvalue)}")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: str, reg):
 		self.instrs.append(f"mov {reg}, {x}")
 
-	@dispatch
+	@typedispatch
 	def set(self, name: ASTIdentifierNode, value):
 		self.set(name.identifier, value)
 
-	@dispatch
+	@typedispatch
 	def set(self, name: str, value: ASTValueNode):
 		self.set(name, value.value)
 
-	@dispatch
+	@typedispatch
 	def set(self, name: str, value: ASTLiteralNode):
 		self.set(name, self.load(value))
 
-	@dispatch
+	@typedispatch
 	def set(self, name: str, value):
 		with self.vars(name) as (var,):
 			self.instrs.append(f"mov {var}, {self.load(value)}")
@@ -154,11 +154,11 @@ class Instrs:
 	def push(self, x):
 		self.instrs.append(f"push {self.load(x)}")
 
-	@dispatch
+	@typedispatch
 	def sizeof(self, x: ASTTypedefNode):
 		return self.sizeof(Signature.build(x, self.ns))
 
-	@dispatch
+	@typedispatch
 	def sizeof(self, x: lambda x: hasattr(x, 'fmt')):
 		return struct.calcsize(x.fmt)
 
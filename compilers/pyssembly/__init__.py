@@ -57,11 +57,11 @@ class Instrs:
 	def compile(self):
 		return pyssembly.Code('\n'.join(self.instrs), name=self.name, filename=self.filename.strip('"'), srclnotab=self.srclnotab, firstlineno=self.firstlineno, consts=self.consts, argnames=self.argnames)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTRootNode):
 		self.add(x.code)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTCodeNode):
 		for ii, i in enumerate(x.nodes):
 			assert (i.lineno >= self.lastln)
@@ -70,11 +70,11 @@ class Instrs:
 			self.lastnodens[0] = i
 			self.add(i)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTValueNode):
 		self.add(x.value)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTVardefNode):
 		typesig = Signature.build(x.type, self.ns)
 		if (x.value is not None):
@@ -95,7 +95,7 @@ class Instrs:
 			]
 			self.store(x.name)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTAssignmentNode):
 		if (x.inplace_operator is not None): self.instrs.append(f"LOAD	({x.name})")
 		self.load(x.value)
@@ -107,7 +107,7 @@ class Instrs:
 			]
 		else: self.store(x.name)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTUnpackAssignmentNode):
 		assert (x.inplace_operator is None) # TODO
 		self.load(x.value)
@@ -115,7 +115,7 @@ class Instrs:
 		for name in x.names:
 			self.store(name)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTAttrsetNode):
 		assert (x.assignment.isattr)
 		if (x.assignment.inplace_operator is not None):
@@ -134,18 +134,18 @@ class Instrs:
 			self.load(x.value)
 		self.instrs.append(f"SETATTR	({x.assignment.name})")
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTFunccallNode):
 		self.load(x)
 		self.instrs.append("POP")
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTBlockNode):
 		self.add(x.code)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTFuncdefNode):
-		code_ns = self.ns.derive(x.name.identifier)
+		code_ns = self.ns.derive(x.code)
 		name = f"{x.name.identifier}({CallArguments(args=x.argdefs, ns=code_ns)})"
 		self.lastnodens[1] = code_ns
 		fname = f"{self.name}.<{x.__fsig__()}>"
@@ -161,9 +161,9 @@ class Instrs:
 		]
 		self.store(name)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTClassdefNode):
-		code_ns = self.ns.derive(x.name.identifier)
+		code_ns = self.ns.derive(x.code)
 		name = x.name.identifier
 		self.lastnodens[1] = code_ns
 		cname = str(name)
@@ -188,7 +188,7 @@ class Instrs:
 		]
 		self.store(name)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTKeywordExprNode):
 		if (x.keyword.keyword == 'import'):
 			m = re.fullmatch(r'(?:(?:(\w+):)?(?:([\w./]+)/)?([\w.]+):)?([\w*]+)', x.value.identifier)
@@ -230,11 +230,11 @@ class Instrs:
 			self.instrs.append("JF :end")
 		else: raise NotImplementedError(x.keyword)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTKeywordDefNode):
 		name = x.name.identifier
 		if (x.keyword.keyword == 'main'):
-			code_ns = self.ns.derive(name)
+			code_ns = self.ns.derive(x.code)
 			self.lastnodens[1] = code_ns
 			f_instrs = Instrs(name=name, ns=code_ns, filename=self.filename, lastnodens=self.lastnodens, firstlineno=x.lineno)
 			f_instrs.add(x.code)
@@ -254,7 +254,7 @@ class Instrs:
 				":nomain",
 			]
 		elif (x.keyword.keyword == 'init'):
-			code_ns = self.ns.derive(name)
+			code_ns = self.ns.derive(x.code)
 			self.lastnodens[1] = code_ns
 			f_instrs = Instrs(name=name, argdefs=(self._self_argdef,), ns=code_ns, filename=self.filename, lastnodens=self.lastnodens, firstlineno=x.lineno)
 			f_instrs.add(x.code)
@@ -268,7 +268,7 @@ class Instrs:
 			]
 			self.store(name)
 		elif (x.keyword.keyword == 'constr'):
-			code_ns = self.ns.derive(name)
+			code_ns = self.ns.derive(x.code)
 			self.ns.define(x, redefine=True)
 			self.lastnodens[1] = code_ns
 			name = f"<constructor ({S(', ').join(i.type for i in x.argdefs)})>"
@@ -285,7 +285,7 @@ class Instrs:
 			self.store(name)
 		else: raise NotImplementedError(x.keyword)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTConditionalNode):
 		self.load(x.condition)
 		self.instrs.append("JFP	:else")
@@ -296,7 +296,7 @@ class Instrs:
 			":end",
 		]
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTForLoopNode):
 		self.load(x.iterable)
 		#self.cellvars.append(x.name.identifier) # TODO FIXME
@@ -313,7 +313,7 @@ class Instrs:
 			":end",
 		]
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTWhileLoopNode):
 		self.instrs += [
 			":while",
@@ -327,38 +327,38 @@ class Instrs:
 			":end",
 		]
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTElseClauseNode):
 		ii = -1 - self.instrs[-1].startswith('#line')
 		assert (self.instrs.pop(ii) == ":end")
 		self.add(x.code) # TODO: stack effect (py38)
 		self.instrs.append(":end")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTLiteralNode):
 		self.instrs.append(f"LOAD	({x.literal})")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTIdentifierNode):
 		self.load(x.identifier)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTListNode):
 		for i in x.values:
 			self.load(i)
 		self.instrs.append(f"BUILD_LIST	{len(x.values)}")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTTupleNode):
 		for i in x.values:
 			self.load(i)
 		self.instrs.append(f"BUILD_TUPLE	{len(x.values)}")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTValueNode):
 		self.load(x.value)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTFunccallNode):
 		#if (isinstance(x.callable, ASTValueNode) and isinstance(x.callable.value, ASTIdentifierNode) and x.callable.value.identifier in self.ns.signatures and not isinstance(self.ns.signatures[x.callable.value.identifier], Class)):
 		callarguments = CallArguments.build(x, self.ns)
@@ -412,58 +412,59 @@ class Instrs:
 
 		self.instrs.append(f"CALL{'EX' if (x.callargs.starargs or x.callkwargs.starkwargs) else 'KW' if (x.callkwargs.callkwargs) else ''}	{n}")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTAttrgetNode):
 		self.load(x.value)
 		assert (x.optype.special == '.') # TODO
 		self.instrs.append(f"GETATTR	({x.attr})")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTUnaryExprNode):
 		self.load(x.value)
 		self.instrs.append(self.unopmap[x.operator.operator])
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTBinaryExprNode):
+		lsig, rsig = Signature.build(x.lvalue, self.ns), Signature.build(x.rvalue, self.ns)
+		char = (isinstance(lsig, stdlib.char) and x.operator.operator not in logical_operators and stdlib.char.operators.lookup(x.operator.operator, type(rsig)) is stdlib.char)  # char arithmetic is done on the code points
 		self.load(x.lvalue)
-		char = isinstance(Signature.build(x.lvalue, self.ns), stdlib.char)
 		if (char): self.instrs.append("CALL	(ord)	1")
 		if (x.operator.operator == 'xor'): self.instrs.append("BOOL")
 		self.load(x.rvalue)
-		if (char and isinstance(Signature.build(x.rvalue, self.ns), stdlib.char)): self.instrs.append("CALL	(ord)	1")
+		if (char and isinstance(rsig, stdlib.char)): self.instrs.append("CALL	(ord)	1")
 		if (x.operator.operator == 'xor'): self.instrs.append("BOOL")
 		if (x.operator.operator == 'to'): self.instrs.append("CALL	(range)	2")
 		else: self.instrs.append(f"CMP	({x.operator.operator})" if (x.operator.operator in dis.cmp_op) else self.binopmap[x.operator.operator])
 		if (x.operator.operator == 'xor'): self.instrs.append("BOOL")
-		if (char and x.operator.operator not in logical_operators): self.instrs.append("CALL	(chr)	1")
+		if (char): self.instrs.append("CALL	(chr)	1")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTItemgetNode):
 		self.load(x.value)
 		self.load(x.key)
 		self.instrs.append("SUBSCR")
 
-	@dispatch
+	@typedispatch
 	def load(self, x: str):
 		self.instrs.append(f"LOAD	{f'${x}' if (x in self.cellvars) else f'<{x}>'}")
 
-	@dispatch
+	@typedispatch
 	def load(self, x):
 		self.instrs.append(f"LOAD_CONST	({repr(x)})")
 
-	@dispatch
+	@typedispatch
 	def store(self, x: ASTIdentifierNode):
 		self.store(x.identifier)
 
-	@dispatch
+	@typedispatch
 	def store(self, x: str):
 		self.instrs.append(f"STORE	{f'${x}' if (x in self.cellvars) else f'<{x}>'}")
 
-	@dispatch
+	@typedispatch
 	def delete(self, x: ASTIdentifierNode):
 		self.delete(x.identifier)
 
-	@dispatch
+	@typedispatch
 	def delete(self, x: str):
 		self.instrs.append(f"DELETE	{f'${x}' if (x in self.cellvars) else f'<{x}>'}")
 
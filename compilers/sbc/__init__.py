@@ -99,44 +99,44 @@ class Instrs:
 	def compile(self):
 		return bytes(self.instrs)
 
-	@dispatch
+	@typedispatch
 	def add(self, opcode: int, *args: int):
 		self.instrs.append(opcode)
 		if (args): self.instrs += bytes(args)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTRootNode):
 		self.add(x.code)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTBlockNode):
 		self.add(x.code)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTCodeNode):
 		for i in x.nodes:
 			self.add(i)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTValueNode):
 		self.add(x.value)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTVardefNode):
 		if (x.value is not None):
 			self.load(x.value, sig=Signature.build(x.type, ns=self.ns))
 			self.store(x.name)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTFunccallNode):
 		self.load(x)
 		self.add(POP)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTKeywordDefNode):
 		if (x.keyword.keyword == 'main'):
 			name = '<main>'
-			code_ns = self.ns.derive(name)
+			code_ns = self.ns.derive(x.code)
 			f_instrs = Instrs(name=name, ns=code_ns, filename=self.filename)
 			f_instrs.add(x.code)
 			self.add(CODE)
@@ -146,14 +146,14 @@ class Instrs:
 			self.add(POP)
 		else: raise NotImplementedError(x.keyword)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTConditionalNode):
 		self.load(x.condition)
 		self.add(IF)
 		self.add(x.code)
 		self.add(END)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTForLoopNode):
 		self.load(x.iterable)
 		self.builtin('iter', 1)
@@ -166,7 +166,7 @@ class Instrs:
 		self.add(DUP, 0)
 		self.add(END)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTWhileLoopNode):
 		self.load(x.condition)
 		self.add(LOOP)
@@ -174,7 +174,7 @@ class Instrs:
 		self.load(x.condition)
 		self.add(END)
 
-	@dispatch
+	@typedispatch
 	def add(self, x: ASTElseClauseNode):
 		assert (self.instrs[-1] == END)
 		end = self.instrs.pop()
@@ -182,7 +182,7 @@ class Instrs:
 		self.add(x.code)
 		self.add(end)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTLiteralNode, *, sig=None):
 		if (sig is None): sig = Signature.build(x, ns=self.ns)
 
@@ -199,15 +199,15 @@ class Instrs:
 		self.add(CONST)
 		self.instrs += t.encode('utf-8')+b'\0' + writeVarInt(len(v)) + v
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTIdentifierNode, **kwargs):
 		self.load(x.identifier, **kwargs)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTValueNode, **kwargs):
 		self.load(x.value, **kwargs)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTFunccallNode):
 		nargs = int()
 
@@ -229,31 +229,31 @@ class Instrs:
 			self.load(x.callable)
 			self.add(CALL, nargs)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTAttrgetNode):
 		if (str(x.value) != 'stdio'): raise NotImplementedError(x)
 		if (x.optype.special != '.'): raise NotImplementedError(x)
 		self.builtin(str(x.attr))
 
-	@dispatch
+	@typedispatch
 	def load(self, x: ASTBinaryExprNode, **kwargs):
 		self.load(x.lvalue, **kwargs)
 		self.load(x.rvalue, **kwargs)
 		self.builtin(self.binopmap[x.operator.operator], 2)
 
-	@dispatch
+	@typedispatch
 	def load(self, x: str, **kwargs):
 		self.add(SGET, self.scpcells[x])
 
-	@dispatch
+	@typedispatch
 	def store(self, x: ASTIdentifierNode):
 		self.store(x.identifier)
 
-	@dispatch
+	@typedispatch
 	def store(self, x: str):
 		self.add(SSET, self.scpcells[x])
 
-	@dispatch
+	@typedispatch
 	def assign(self, builtin: str,
 			 nargs_code: lambda nargs_code: isinstance(nargs_code, int) and 0 <= nargs_code < 4,
 			 nargs_stack: lambda nargs_stack: isinstance(nargs_stack, int) and 0 <= nargs_stack < 64,
@@ -263,12 +263,12 @@ class Instrs:
 		self.add(ASGN, opcode, (nargs_code << 6) | nargs_stack)
 		self.opmap[builtin, nargs_code, nargs_stack] = opcode
 
-	@dispatch
+	@typedispatch
 	def builtin(self, builtin: str):
 		self.add(BLTIN)
 		self.instrs += builtin.encode('ascii')+b'\0'
 
-	@dispatch
+	@typedispatch
 	def builtin(self, builtin: str, nargs: int):
 		if (nargs is not None and len(self.opmap) < 0xf0): self.assign(builtin, 0, nargs)
 		if ((builtin, 0, nargs) in self.opmap): self.add(self.opmap[builtin, 0, nargs])
@@ -1,51 +1,192 @@
 #!/usr/bin/python3
 # Slang lexer
 
+import bisect
 from .tokens import *
 
-def read_token(src, *, lineno, offset, lineoff):
-	(l, src), line = lstripcount(src[offset:], whitespace), src
-	offset += l
-	if (src[:1] in '\n;'): return (offset, None)
+def read_token(src, *, lineno, offset, lineoff, start=0):
+	l = offset
+	while (offset < len(src) and src[offset] in whitespace): offset += 1
+	l = offset-l
+	if (src[offset:offset+1] in '\n;'): return (offset, None)
 	err = (0, 0)
 	for ii, i in enumerate(Token.types):
-		r = globals()['find_'+i.casefold()](src)
-		n, s = r if (isinstance(r, tuple)) else (r, src[:r]) if (isinstance(r, int) and r > 0) else (0, None)
+		r = globals()['find_'+i.casefold()](src, offset)
+		n, s = r if (isinstance(r, tuple)) else (r, src[offset:offset+r]) if (isinstance(r, int) and r > 0) else (0, None)
 		if (isinstance(n, int) and n <= 0): err = max(err, (-n, s if (isinstance(s, int)) else 0)); continue
 		return (offset+n, Token(ii, s, lineno=lineno, offset=offset+lineoff))
-	else: raise SlSyntaxError("Invalid token", [None]*(lineno-1)+line.split('\n'), lineno=lineno, offset=offset+lineoff, length=err[0]+l, char=err[1])
+	else: raise SlSyntaxError("Invalid token", [None]*(lineno-1)+src[start:].split('\n'), lineno=lineno, offset=offset+lineoff, length=err[0]+l, char=err[1])
 
-def parse_expr(src, *, lineno=1, lineoff=0):
+tokentypes = {i: ii for ii, i in enumerate(Token.types)}
+
+def match_token(src, *, lineno, offset, lineoff, start=0):
+	m = token_regex.match(src, offset)
+	if (m is not None):
+		t = m.lastgroup
+		o, n = m.start(t), m.end(t)
+		if (t == 'END'): return (o, None)
+		if (t == 'NESTED'): t, n = 'SPECIAL', find_nested_comment(src, o)
+		elif (t == 'RADIX'): t, n = 'LITERAL', find_radix_literal(src, o)
+		if (n is not None and src[n:n+1] < '\x80'):
+			s = src[o:n]
+			if (t == 'OPERATOR'): s = token_operators[s]
+			elif (t == 'KEYWORD'): s = token_keywords[s]
+			return (n, Token(tokentypes[t], s, lineno=lineno, offset=o+lineoff))
+	return read_token(src, lineno=lineno, offset=offset, lineoff=lineoff, start=start)
+
+def line_index(src):
+	r = [0]
+	i = src.find('\n')
+	while (i >= 0):
+		r.append(i+1)
+		i = src.find('\n', i+1)
+	return r
+
+def parse_expr(src, start=0, *, lines=None, lnooff=0, lineoff=0, reader=match_token, comments=None):
+	# Comments and line continuations are left out of the returned tokens and appended to `comments' instead, if given.
+	if (lines is None): lines = line_index(src)
 	r = list()
-	lines = src.count('\n')
-	offset = int()
+	offset = start
+	lineoff -= start
 	continueln = False
 	while (True):
-		offset, tok = read_token(src, lineno=lines-src[offset:].count('\n')+lineno, offset=offset, lineoff=lineoff)
+		offset, tok = reader(src, lineno=bisect.bisect_right(lines, offset)+lnooff, offset=offset, lineoff=lineoff, start=start)
 		if (tok is None):
 			if (not continueln): break
 			continueln = False
 			offset += 1
 			lineoff = -offset
 			continue
-		elif (continueln and tok.token[0] != '#'): raise SlSyntaxError("Expected newline or comment after line continuation", src, lineno=lines-src[offset:].count('\n')+lineno, offset=tok.offset, length=tok.length)
-		r.append(tok)
+		elif (continueln and tok.token[0] != '#'): raise SlSyntaxError("Expected newline or comment after line continuation", src[start:], lineno=bisect.bisect_right(lines, offset)+lnooff, offset=tok.offset, length=tok.length)
+		if (not is_comment(tok)): r.append(tok)
+		elif (comments is not None): comments.append(tok)
 		if (tok.token[0] != '#'): continueln = (tok.token == '\\' and tok.offset)
 	return offset, r
 
-def parse_string(src, lnooff=0):
-	src = src.rstrip()
-	tl = list()
-	lines = src.count('\n')+lnooff
-	lineoff = int()
-	while (src):
-		offset, r = parse_expr(src, lineno=lines-src.count('\n')+1, lineoff=lineoff)
-		lineoff += offset
-		if (offset < len(src)):
-			if (src[offset] == '\n'): lineoff = int()
-			else: lineoff += 1
-		src = src[offset+1:]
-		tl.append(r)
-	return tl
+def next_expr(src, offset, end, lineoff):
+	lineoff += end-offset
+	if (end < len(src)):
+		if (src[end] == '\n'): lineoff = int()
+		else: lineoff += 1
+	return (end+1, lineoff)
+
+def iter_string(src, lnooff=0, *, lines=None, reader=match_token, comments=None):
+	if (lines is None): lines = line_index(src)
+	offset = lineoff = int()
+	while (offset < len(src)):
+		end, r = parse_expr(src, offset, lines=lines, lnooff=lnooff, lineoff=lineoff, reader=reader, comments=comments)
+		offset, lineoff = next_expr(src, offset, end, lineoff)
+		yield r
+
+def parse_string(src, lnooff=0, *, reader=match_token, comments=None):
+	return list(iter_string(src.rstrip(), lnooff, reader=reader, comments=comments))
+
+def iter_statements(file, lnooff=0, *, reader=match_token, comments=None):
+	src = str()
+	lines = [0]
+	offset = lineoff = limit = int()
+	for line in itertools.chain(file, (None,)):
+		if (line is None): src = src.rstrip(); limit = len(src)
+		else:
+			src += line
+			if (line[-1:] == '\n'): lines.append(len(src))
+			if (not line.isspace()): limit = len(src)-len(line)+len(line.rstrip())
+		while (offset < limit):
+			c = list()
+			try: end, r = parse_expr(src, offset, lines=lines, lnooff=lnooff, lineoff=lineoff, reader=reader, comments=c)
+			except SlSyntaxError:
+				if (line is None): raise
+				break  # may be resolved by the following lines
+			if (line is not None and end >= limit): break  # only whitespace is known to follow
+			offset, lineoff = next_expr(src, offset, end, lineoff)
+			if (comments is not None): comments += c
+			yield r
+		if (not lineoff and offset):
+			n = bisect.bisect_right(lines, offset)-1
+			lnooff += n
+			src, offset, limit = src[offset:], int(), limit-offset
+			lines = [i-lines[n] for i in lines[n:]]
+
+def iter_tokens(file, lnooff=0, *, reader=match_token, comments=None):
+	for i in iter_statements(file, lnooff, reader=reader, comments=comments): yield from i
+
+class TokenTable(Slots):
+	src: ...
+	lnooff: ...
+	reader: ...
+	lines: ...
+	statements: ...
+	comments: ...
+	starts: ...
+	lineoffs: ...
+
+	def __init__(self, src, lnooff=0, *, reader=match_token):
+		self.src, self.lnooff, self.reader = src, lnooff, reader
+		self.lines = line_index(src)
+		self.statements, self.comments, self.starts, self.lineoffs = self.lex(src.rstrip(), 0, 0)
+
+	def __repr__(self):
+		return f"<TokenTable of {len(self.statements)} statements>"
+
+	def __iter__(self):
+		return iter(self.statements)
+
+	def __len__(self):
+		return len(self.statements)
+
+	def __getitem__(self, x):
+		return self.statements[x]
+
+	def lex(self, src, offset, lineoff, *, lines=None, sync=None):
+		r, comments, starts, lineoffs = list(), list(), list(), list()
+		while (offset < len(src) and not (sync is not None and sync(offset, lineoff))):
+			c = list()
+			end, tl = parse_expr(src, offset, lines=lines or self.lines, lnooff=self.lnooff, lineoff=lineoff, reader=self.reader, comments=c)
+			r.append(tl)
+			comments.append(c)
+			starts.append(offset)
+			lineoffs.append(lineoff)
+			offset, lineoff = next_expr(src, offset, end, lineoff)
+		return (r, comments, starts, lineoffs)
+
+	def edit(self, start, end, text):
+		src = self.src[:start]+text+self.src[end:]
+		delta = len(text)-(end-start)
+
+		a, b = bisect.bisect_right(self.lines, start), bisect.bisect_right(self.lines, end)
+		lines = self.lines[:a]
+		i = text.find('\n')
+		while (i >= 0):
+			lines.append(start+i+1)
+			i = text.find('\n', i+1)
+		dl = len(lines)-b
+		lines += (i+delta for i in self.lines[b:])
+
+		# relex from the statement containing the edit (or the new end of input) until a statement boundary lines up with an old one
+		stripped = src.rstrip()
+		k = max(bisect.bisect_right(self.starts, min(start, len(stripped)-1))-1, 0)
+		j = len(self.starts)
+		def sync(offset, lineoff):
+			nonlocal j
+			if (offset < start+len(text)): return False
+			i = bisect.bisect_left(self.starts, offset-delta, k)
+			if (i < len(self.starts) and self.starts[i] == offset-delta and self.lineoffs[i] == lineoff): j = i; return True
+			return False
+		r, comments, starts, lineoffs = self.lex(stripped, *((self.starts[k], self.lineoffs[k]) if (self.starts) else (0, 0)), lines=lines, sync=sync)
+
+		if (dl):
+			for tl in itertools.chain(self.statements[j:], self.comments[j:]):
+				for i in tl: i.lineno += dl
+		self.src, self.lines = src, lines
+		self.statements[k:j] = r
+		self.comments[k:j] = comments
+		self.starts[k:] = starts+[i+delta for i in self.starts[j:]]
+		self.lineoffs[k:j] = lineoffs
+		return range(k, k+len(r))
+
+def read_source(file):
+	src = file.read()  # a plain read decodes once; a mapping had to be decoded whole anyway
+	if ('\r' in src): src = src.replace('\r\n', '\n').replace('\r', '\n')
+	return src
 
 # by Sdore, 2020
@@ -3,6 +3,7 @@
 
 import readline
 from .ast import *
+from .cache import *
 from .lexer import *
 from utils.nolog import *
 
@@ -14,7 +15,7 @@ def get_node_value(node, ns):
 		except Exception: pass
 	return node
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTCodeNode, ns):
 	r = None
 	for i in node.nodes:
@@ -25,23 +26,25 @@ def execute_node(node: ASTCodeNode, ns):
 			print(repr(r))
 	return r
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTVardefNode, ns):
 	if (node.value is not None): ns.values[node.name] = get_node_value(node.value, ns)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTBlockNode, ns):
 	return execute_node(node.code, ns)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTFuncdefNode, ns):
+	old = ns.values.get(node.name.identifier)
+	if (isinstance(old, ASTFuncdefNode) and old is not node): ns.forget_child(id(old.code))  # the scope of the replaced definition goes with it
 	ns.values[node.name.identifier] = node
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTAssignmentNode, ns):
 	ns.values[node.name] = execute_node(ASTBinaryExprNode(node.name, node.inplace_operator, node.value, lineno=node.value.lineno, offset=node.value.offset), ns) if (node.inplace_operator is not None) else get_node_value(node.value, ns)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTUnaryOperationNode, ns):
 	def _op(): execute_node(ASTAssignmentNode(node.name, node.isattr, ASTSpecialNode('=', lineno=node.unary_operator.lineno, offset=node.unary_operator.offset), ASTOperatorNode(node.unary_operator.operator[0], lineno=node.unary_operator.lineno, offset=node.unary_operator.offset), ASTLiteralNode(1 if (node.unary_operator.operator[0] in '+-') else get_node_value(node.name, ns), lineno=node.unary_operator.lineno, offset=node.unary_operator.offset), lineno=node.lineno, offset=node.offset), ns)
 	if (isinstance(node, ASTUnaryPreOperationNode)): _op()
@@ -49,11 +52,11 @@ def execute_node(node: ASTUnaryOperationNode, ns):
 	if (isinstance(node, ASTUnaryPostOperationNode)): _op()
 	return res
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTItemgetNode, ns):
 	return get_node_value(node.value, ns)[get_node_value(node.key, ns)]
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTAttrgetNode, ns):
 	if (node.optype.special == '.'):
 		if (isinstance(node.value.value, ASTIdentifierNode) and node.value.value.identifier == 'stdio'):
@@ -62,7 +65,7 @@ def execute_node(node: ASTAttrgetNode, ns):
 		elif (node.attr.identifier == 'each'): return stdlib._each
 	raise NotImplementedError(node)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTFunccallNode, ns):
 	func = execute_node(node.callable, ns)
 
@@ -77,54 +80,54 @@ def execute_node(node: ASTFunccallNode, ns):
 		return f(*(get_node_value(i, ns) for i in node.callargs.callargs),
 			 *(get_node_value(j, ns) for i in node.callargs.starargs for j in get_node_value(i, ns)))
 
-	code_ns = ns.derive(str(node.callable), append=False)
+	code_ns = ns.derive(func.code)
 	for ii, i in enumerate(node.callargs.callargs):
 		code_ns.values[func.argdefs[ii].name] = get_node_value(i, ns)
 	return execute_node(func.code, code_ns)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTValueNode, ns):
 	return execute_node(node.value, ns)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTIdentifierNode, ns):
 	if (ns.values.get(node) is None): raise SlValidationError(f"{node} is not initialized", node, scope=ns.scope)
 	return ns.values[node]
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTLiteralNode, ns):
 	if (isinstance(node.literal, str)):
 		try: return eval(node.literal)
 		except Exception as ex: raise SlReplError(ex, node, scope=ns.scope)
 	else: return node.literal
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTListNode, ns):
 	return list(node.values)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTTupleNode, ns):
 	return tuple(node.values)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTKeywordExprNode, ns):
 	if (node.keyword.keyword == 'return'): return execute_node(node.value, ns)
 	elif (node.keyword.keyword == 'delete'): ns.delete(node.value)
 	else: raise NotImplementedError(node.keyword)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTKeywordDefNode, ns):
 	if (node.keyword.keyword == 'main'):
 		execute_node(node.code, ns)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTConditionalNode, ns):
 	if (execute_node(node.condition, ns)):
 		execute_node(node.code, ns)
 	else: return
 	return ...
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTForLoopNode, ns):
 	ns.define(node.name, Signature.build(node.iterable, ns).valtype)
 	ns.weaken(node.name)
@@ -134,24 +137,24 @@ def execute_node(node: ASTForLoopNode, ns):
 	else: return
 	return ...
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTWhileLoopNode, ns):
 	while (get_node_value(execute_node(node.condition, ns), ns)):
 		execute_node(node.code, ns)
 	else: return
 	return ...
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTElseClauseNode, ns):
 	execute_node(node.code, ns)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTUnaryExprNode, ns):
 	value = get_node_value(node.value, ns)
 	try: return eval(f"{node.operator.operator} value")
 	except Exception as ex: raise SlReplError(ex, node, scope=ns.scope)
 
-@dispatch
+@typedispatch
 def execute_node(node: ASTBinaryExprNode, ns):
 	lvalue = get_node_value(node.lvalue, ns)
 	rvalue = get_node_value(node.rvalue, ns)
@@ -266,16 +269,22 @@ def repl(*, optimize=0):
 		while (True):
 			try:
 				l.append(input(f"\1\033[1;93m\2{'...' if (tl) else '>>>'}\1\033[0m\2 "))
-				tll = parse_string(l[-1], lnooff=len(l)-1)
-				if (not tll): l.pop(); continue
+				comments = list()
+				tll = [i for i in parse_string(l[-1], lnooff=len(l)-1, comments=comments) if i]
+				if (not tll and not comments): l.pop(); continue
 				tl += tll
-				if (tl[-1][-1].token == '\\'): continue
+				if (comments and comments[-1].token == '\\'): continue
+				if (not tl): l.clear(); continue
 				#if (len(tl) >= 2 and tl[-2][-1].token == '\\'): tl[-1] = tl[-2][:-1]+tl.pop() # TODO FIXME?: [['a', '+', '\\'], 'b'] --> [['a', '+', 'b']]
 				if (tl[0][-1].token == '{' and tl[-1][-1].token != '}'): continue
 				ast = build_ast(tl, interactive=True)
 				if (optimize): optimize_ast(ast, validate_ast(ast), optimize)
-				validate_ast(ast, ns)
-				execute_node(ast.code, ns)
+				children = set(ns.children)
+				try:
+					validate_ast(ast, ns)
+					execute_node(ast.code, ns)
+				finally:
+					for k in ns.children.keys() - children - {id(i.code) for i in ast.code.nodes if (isinstance(i, ASTFuncdefNode))}: ns.forget_child(k)  # only the scopes of the functions it defines outlive an input
 			except KeyboardInterrupt:
 				buf = readline.get_line_buffer()
 				print(f"\r\033[2m^C{'> '+buf if (buf) else ' '}\033[0m")
@@ -289,24 +298,27 @@ def repl(*, optimize=0):
 			l.clear()
 	finally: readline.write_history_file(histfile)
 
-def run_file(file, *, optimize=0):
-	src = file.read()
-
+def run_file(file, *, optimize=0, cache=True):
 	try:
-		tl = parse_string(src)
-		ast = build_ast(tl, file.name.join('""'))
+		cache = (cache and file.seekable())
+		if (cache): key = cache_key(iter(lambda: file.read(1 << 16), ''), file.name); file.seek(0)
+		ast = load_ast(key) if (cache) else None
+		if (ast is None):
+			ast = build_ast(iter_statements(file), file.name.join('""'))
+			if (cache): store_ast(key, ast)
 		if (optimize): optimize_ast(ast, validate_ast(ast), optimize)
 		ns = validate_ast(ast)
 		execute_node(ast.code, ns)
 	except (SlSyntaxException, SlNodeException) as ex:
-		if (not ex.srclines): ex.srclines = src.split('\n')
+		if (not ex.srclines and file.seekable()): file.seek(0); ex.srclines = read_source(file).split('\n')
 		sys.exit(str(ex))
 
 @apmain
 @aparg('file', metavar='file.sl', nargs='?', type=argparse.FileType('r'))
 @aparg('-O', metavar='level', help='Code optimization level', type=int, default=DEFAULT_OLEVEL)
+@aparg('--no-cache', help=f"Don't use the parse cache (in {CACHE_DIR})", dest='cache', action='store_false')
 def main(cargs):
-	if (cargs.file is not None): run_file(cargs.file, optimize=cargs.O)
+	if (cargs.file is not None): run_file(cargs.file, optimize=cargs.O, cache=cargs.cache)
 	else: repl(optimize=cargs.O)
 
 if (__name__ == '__main__'): main(nolog=True)
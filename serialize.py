@@ -0,0 +1,241 @@
+#!/usr/bin/python3
+# Slang AST binary serialization
+
+import io, struct
+from .ast import *
+from utils import *
+
+AST_MAGIC = b'SlAST\2'
+
+# value tags
+T_NONE, T_FALSE, T_TRUE, T_INT, T_FLOAT, T_NEWSTR, T_STR, T_LIST, T_TUPLE, T_SLICE, T_SET, T_NODE, T_REF, T_MISSING = range(14)
+
+@functools.lru_cache(maxsize=None)
+def serializable_classes():
+	# → `name' → class, for the classes that a serialized AST may name: the nodes, the strings of the tokens and the sets of their `flags'
+	r = {i.__name__: i for i in (str, set, frozenset, paramset)}
+	stack = [ASTNode, Keyword, Operator]
+	while (stack):
+		c = stack.pop()
+		r[c.__name__] = c
+		stack += c.__subclasses__()
+	return r
+
+class ASTWriter(Slots):
+	# Each `write()' appends one length-prefixed record; classes, strings and nodes are numbered on first use and referred to by index after that, across records.
+
+	file: ...
+	classes: ...
+	strings: ...
+	nodes: ...
+
+	def __init__(self, file):
+		self.file, self.classes, self.strings, self.nodes = file, {}, {}, {}
+		self.file.write(AST_MAGIC)
+
+	def write(self, x):
+		data = self.encode(x)
+		n = len(data)
+		head = bytearray()
+		while (n >= 0x80):
+			head.append(n & 0x7f | 0x80)
+			n >>= 7
+		head.append(n)
+		self.file.write(head+data)
+
+	def encode(self, x):
+		classes, strings, nodes = self.classes, self.strings, self.nodes
+		buf = bytearray()
+
+		def uint(x):
+			while (x >= 0x80):
+				buf.append(x & 0x7f | 0x80)
+				x >>= 7
+			buf.append(x)
+
+		def blob(x):
+			uint(len(x))
+			buf.extend(x)
+
+		def cls(x):
+			# writes the class of `x', defining it on first use; returns the field names of a node
+			try: ref, fields = classes[type(x)]
+			except KeyError: pass
+			else: uint(ref+1); return fields
+			fields = tuple(allslots(x)) if (isinstance(x, ASTNode)) else None
+			classes[type(x)] = (len(classes), fields)
+			uint(0)
+			blob(type(x).__name__.encode())
+			if (fields is not None):
+				uint(len(fields))
+				for i in fields: blob(i.encode())
+			return fields
+
+		def value(x):
+			if (x is None): buf.append(T_NONE)
+			elif (x is False): buf.append(T_FALSE)
+			elif (x is True): buf.append(T_TRUE)
+			elif (isinstance(x, ASTNode)):
+				try: ref = nodes[id(x)][0]
+				except KeyError: pass
+				else: buf.append(T_REF); uint(ref); return
+				nodes[id(x)] = (len(nodes), x)  # keeps `x' alive so its id isn't reused
+				buf.append(T_NODE)
+				for i in cls(x):
+					try: v = getattr(x, i)
+					except AttributeError: buf.append(T_MISSING); continue
+					if (v is None): buf.append(T_NONE)
+					elif (type(v) is int and 0 <= v < 0x40): buf.append(T_INT); buf.append(v << 1)
+					else: value(v)
+			elif (isinstance(x, str)):
+				key = (type(x), x)
+				try: ref = strings[key]
+				except KeyError: pass
+				else: buf.append(T_STR); uint(ref); return
+				strings[key] = len(strings)
+				buf.append(T_NEWSTR)
+				cls(x)
+				blob(x.encode())
+			elif (type(x) is int): buf.append(T_INT); uint(x << 1 if (x >= 0) else ~x << 1 | 1)
+			elif (type(x) is float): buf.append(T_FLOAT); buf.extend(struct.pack('<d', x))
+			elif (type(x) in (list, tuple)):
+				buf.append(T_LIST if (type(x) is list) else T_TUPLE)
+				uint(len(x))
+				for i in x: value(i)
+			elif (type(x) is slice):
+				buf.append(T_SLICE)
+				for i in (x.start, x.stop, x.step): value(i)
+			elif (isinstance(x, (set, frozenset, paramset))):  # `flags' and `modifiers' of the nodes
+				buf.append(T_SET)
+				cls(x)
+				uint(len(x))
+				for i in x: value(i)
+			else: raise TypeError(f"Can't serialize a `{type(x).__name__}' in a Slang AST")
+
+		value(x)
+		return buf
+
+class ASTReader(Slots):
+	file: ...
+	classes: ...
+	strings: ...
+	nodes: ...
+
+	def __init__(self, file):
+		self.file, self.classes, self.strings, self.nodes = file, [], [], []
+		if (self.file.read(len(AST_MAGIC)) != AST_MAGIC): raise ValueError("Not a serialized Slang AST")
+
+	def __iter__(self):
+		while (True):
+			try: yield self.read()
+			except EOFError: break
+
+	def read(self):
+		n = shift = 0
+		while (True):
+			b = self.file.read(1)
+			if (not b):
+				if (shift): break
+				raise EOFError()
+			n |= (b[0] & 0x7f) << shift
+			if (b[0] < 0x80):
+				data = self.file.read(n)
+				if (len(data) == n): return self.decode(data)
+				break
+			shift += 7
+		raise ValueError("Truncated serialized Slang AST")
+
+	def decode(self, data):
+		classes, strings, nodes = self.classes, self.strings, self.nodes
+		pos = 0
+
+		def uint():
+			nonlocal pos
+			b = data[pos]; pos += 1
+			if (b < 0x80): return b
+			r, shift = b & 0x7f, 7
+			while (True):
+				b = data[pos]; pos += 1
+				r |= (b & 0x7f) << shift
+				if (b < 0x80): return r
+				shift += 7
+
+		def blob():
+			nonlocal pos
+			n = uint()
+			pos += n
+			return data[pos-n:pos]
+
+		def cls():
+			ref = uint()
+			if (ref): return classes[ref-1]
+			name = blob().decode()
+			try: cls = serializable_classes()[name]
+			except KeyError: raise ValueError(f"Unknown class in serialized Slang AST: {name}")
+			if (issubclass(cls, ASTNode)): cls = (cls, tuple(blob().decode() for _ in range(uint())))
+			classes.append(cls)
+			return cls
+
+		def value():
+			nonlocal pos
+			tag = data[pos]; pos += 1
+			if (tag == T_NODE):
+				ref = data[pos]
+				if (0 < ref < 0x80): pos += 1; cls_, fields = classes[ref-1]
+				else: cls_, fields = cls()
+				node = cls_.__new__(cls_)
+				nodes.append(node)
+				for i in fields:
+					# the usual field values are decoded in place: one-byte ints (most of lineno/offset), None, early strings, and empty sets of a known class (flags)
+					tag = data[pos]
+					if (tag == T_INT and data[pos+1] < 0x80):
+						x = data[pos+1]; pos += 2
+						setattr(node, i, (x >> 1) if (not x & 1) else ~(x >> 1))
+					elif (tag == T_MISSING): pos += 1
+					elif (tag == T_NONE): pos += 1; setattr(node, i, None)
+					elif (tag == T_STR and data[pos+1] < 0x80): pos += 2; setattr(node, i, strings[data[pos-1]])
+					elif (tag == T_SET and 0 < data[pos+1] < 0x80 and data[pos+2] == 0): pos += 3; setattr(node, i, classes[data[pos-2]-1]())
+					else: setattr(node, i, value())
+				return node
+			if (tag == T_STR): return strings[uint()]
+			if (tag == T_INT):
+				x = uint()
+				return (x >> 1) if (not x & 1) else ~(x >> 1)
+			if (tag == T_NONE): return None
+			if (tag == T_LIST): return [value() for _ in range(uint())]
+			if (tag == T_NEWSTR):
+				cls_ = cls()
+				s = blob().decode()
+				if (cls_ is not str): s = cls_(s)
+				strings.append(s)
+				return s
+			if (tag == T_SET):
+				cls_ = cls()
+				return cls_(value() for _ in range(uint()))
+			if (tag == T_REF): return nodes[uint()]
+			if (tag == T_FALSE): return False
+			if (tag == T_TRUE): return True
+			if (tag == T_TUPLE): return tuple(value() for _ in range(uint()))
+			if (tag == T_SLICE): return slice(value(), value(), value())
+			if (tag == T_FLOAT): pos += 8; return struct.unpack_from('<d', data, pos-8)[0]
+			raise ValueError(f"Bad tag in serialized Slang AST: {tag}")
+
+		try: r = value()
+		except IndexError: raise ValueError("Truncated serialized Slang AST")
+		except (TypeError, AttributeError, RecursionError) as ex: raise ValueError("Damaged serialized Slang AST") from ex  # e.g. a class used as the wrong kind of value
+		if (pos != len(data)): raise ValueError("Trailing data in serialized Slang AST record")
+		return r
+
+def write_ast(node, file):
+	ASTWriter(file).write(node)
+
+def read_ast(file):
+	return ASTReader(file).read()
+
+def serialize_ast(node):
+	f = io.BytesIO()
+	write_ast(node, f)
+	return f.getvalue()
+
+def deserialize_ast(data):
+	return read_ast(io.BytesIO(data))
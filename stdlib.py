@@ -1,7 +1,7 @@
 #!/usr/bin/python3
 # Slang stdlib
 
-from .ast import Signature, Function, Object, Collection, CallArguments, MultiCollection
+from .ast import Signature, Function, Object, Collection, CallArguments, MultiCollection, intern_signature
 from .tokens import *
 from utils import *
 
@@ -27,24 +27,63 @@ class BuiltinFunction(Builtin, Function):
 
 class BuiltinObject(Builtin, Object): pass
 
+class OperatorTable(Slots):
+	# `operators' of a builtin type, compiled from its `operator_signatures': `operators[op]' for unary and `operators[op, valsig]' for binary operators.
+	# Results are looked up once per operator and operand type; backends can get the resulting type with `lookup()'.
+
+	selftype: ...
+	table: dict
+
+	def __init__(self, selftype):
+		self.selftype = selftype
+
+	def __getitem__(self, x):
+		op, valsig = x if (isinstance(x, builtins.tuple)) else (x, None)
+		r = self.lookup(op, type(valsig) if (valsig is not None) else None)
+		if (r is None): raise KeyError(x)
+		return valsig if (r is ...) else intern_signature(r)
+
+	def __contains__(self, x):
+		op, valsig = x if (isinstance(x, builtins.tuple)) else (x, None)
+		return (self.lookup(op, type(valsig) if (valsig is not None) else None) is not None)
+
+	def lookup(self, op, valtype=None):
+		# → the resulting type, ... for the operand's own signature, or None if unsupported
+		try: return self.table[op, valtype]
+		except KeyError: pass
+		r = self.table[op, valtype] = self.resolve(op, valtype)
+		return r
+
+	def resolve(self, op, valtype):
+		if (valtype is None):
+			if (op in operators[9]): return bool  # unary `not'
+		else:
+			if (issubclass(valtype, self.selftype) and op in operators[8]): return bool  # comparisons
+			if (op in operators[10]+operators[11]+operators[12]): return valtype  # binary `and'. `xor', `or'
+		for res, ops, valtypes in self.selftype.operator_signatures:
+			if (op not in builtins.tuple(ops) or (valtypes is None) != (valtype is None)): continue
+			if (valtypes is not None and not issubclass(valtype, builtins.tuple(globals()[i] for i in valtypes))): continue
+			return globals()[res] if (res is not ...) else ...
+
 class BuiltinType(Builtin):
-	def __eq__(self, x):
-		return (super().__eq__(x) or issubclass(x.__class__, self.__class__) or issubclass(self.__class__, x.__class__))
+	operator_signatures = ()  # `(result, operators, operand types)', the first match wins; types are given by name, operand types are None for unary operators and ... as a result stands for the operand's signature
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		if ('operator_signatures' in cls.__dict__): cls.operators = OperatorTable(cls)
+
+	def matches(self, x):
+		return (super().matches(x) or issubclass(x.__class__, self.__class__) or issubclass(self.__class__, x.__class__))
 
 	@staticitemget
 	@instantiate
-	def operators(op, valsig=None, selftype=None):
-		if (valsig is None):
-			if (op in operators[9]): return bool  # unary `not'
-		else:
-			assert (selftype is not None)
-			if (isinstance(valsig, selftype) and op in operators[8]): return bool  # comparisons
-			if (op in operators[10]+operators[11]+operators[12]): return type(valsig)  # binary `and'. `xor', `or'
+	def operators(op, valsig=None):
+		if (valsig is None and op in operators[9]): return bool  # unary `not'
 		raise KeyError()
 
 @singleton
 class Any(BuiltinType):
-	def __eq__(self, x):
+	def matches(self, x):
 		return True
 
 class auto(BuiltinType): pass
@@ -55,58 +94,35 @@ class void(BuiltinType):
 		raise KeyError()
 
 class bool(BuiltinType):
-	@staticitemget
-	@instantiate
-	def operators(op, valsig=None):
-		try: return BuiltinType.operators(op, valsig=valsig, selftype=bool)
-		except KeyError: pass
-		if (valsig is None):
-			if (op in map(UnaryOperator, '+-~')): return int
-			if (op == UnaryOperator('!')): return bool
-		raise KeyError()
+	operator_signatures = (
+		('int', '+-~', None),
+		('bool', '!', None),
+	)
 
 class int(BuiltinType):
-	@staticitemget
-	@instantiate
-	def operators(op, valsig=None):
-		try: return BuiltinType.operators(op, valsig=valsig, selftype=int)
-		except KeyError: pass
-		if (valsig is None):
-			if (op in map(UnaryOperator, '+-~')): return int
-			if (op == UnaryOperator('!')): return bool
-		if (isinstance(valsig, (int, float))):
-			if (op in map(BinaryOperator, ('**', *'+-*%'))): return valsig
-			if (op in map(BinaryOperator, ('//', '<<', '>>', *'&^|'))): return int
-			if (op == BinaryOperator('/')): return float
-		if (isinstance(valsig, int)):
-			if (op == BinaryOperator('to')): return range
-		raise KeyError()
+	operator_signatures = (
+		('int', '+-~', None),
+		('bool', '!', None),
+		(..., ('**', *'+-*%'), ('int', 'float')),
+		('int', ('//', '<<', '>>', *'&^|'), ('int', 'float')),
+		('float', '/', ('int', 'float')),
+		('range', ('to',), ('int',)),
+	)
 
 class float(BuiltinType):
-	@staticitemget
-	@instantiate
-	def operators(op, valsig=None):
-		try: return BuiltinType.operators(op, valsig=valsig, selftype=float)
-		except KeyError: pass
-		if (valsig is None):
-			if (op in map(UnaryOperator, '+-')): return float
-			if (op == UnaryOperator('!')): return bool
-		if (isinstance(valsig, (int, float))):
-			if (op in map(BinaryOperator, ('**', *'+-*%'))): return float
-			if (op == BinaryOperator('/')): return float
-			if (op == BinaryOperator('//')): return int
-		raise KeyError()
+	operator_signatures = (
+		('float', '+-', None),
+		('bool', '!', None),
+		('float', ('**', *'+-*%'), ('int', 'float')),
+		('float', '/', ('int', 'float')),
+		('int', ('//',), ('int', 'float')),
+	)
 
 class str(BuiltinType):
-	@staticitemget
-	@instantiate
-	def operators(op, valsig=None):
-		try: return BuiltinType.operators(op, valsig=valsig, selftype=str)
-		except KeyError: pass
-		if (valsig is not None):
-			if (isinstance(valsig, (char, str)) and op == BinaryOperator('+')): return str
-			if (isinstance(valsig, int) and op == BinaryOperator('*')): return str
-		raise KeyError()
+	operator_signatures = (
+		('str', '+', ('char', 'str')),
+		('str', '*', ('int',)),
+	)
 
 	@staticitemget
 	@instantiate
@@ -133,16 +149,11 @@ class str(BuiltinType):
 			return (None, int())
 
 class char(BuiltinType):
-	@staticitemget
-	@instantiate
-	def operators(op, valsig=None):
-		try: return BuiltinType.operators(op, valsig=valsig, selftype=char)
-		except KeyError: pass
-		if (valsig is not None):
-			if (isinstance(valsig, str) and op in map(BinaryOperator, ('+', 'in'))): return str
-			if (isinstance(valsig, int) and op == BinaryOperator('*')): return str
-			if (isinstance(valsig, (char, int)) and op in map(BinaryOperator, '+-')): return char
-		raise KeyError()
+	operator_signatures = (
+		('str', ('+', 'in'), ('str',)),
+		('str', '*', ('int',)),
+		('char', '+-', ('char', 'int')),
+	)
 
 class i8(int): fmt: 'b'
 class u8(int): fmt: 'B'
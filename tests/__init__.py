@@ -0,0 +1,18 @@
+#!/usr/bin/python3
+# Slang tests
+
+from utils import *
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def test_sources():
+	# `(name, source)' for each of the test programs, in order of name
+	return [(i, open(os.path.join(TESTS_DIR, i)).read()) for i in sorted(os.listdir(TESTS_DIR)) if i.endswith('.sl')]
+
+def outcome(f, *args, **kwargs):
+	# → `(True, result)' or `(False, (exception type name, lineno, offset))', for comparing what two implementations did
+	try: return (True, f(*args, **kwargs))
+	except Exception as ex: return (False, (type(ex).__name__, getattr(ex, 'lineno', None), getattr(ex, 'offset', None)))
+
+def report(name, **values):
+	print(f"{name}: "+', '.join(f"{k} {f'{v:.4f}' if (isinstance(v, float)) else v}" for k, v in values.items()))
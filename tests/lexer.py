@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+# Slang lexer test: `match_token()' against `read_token()'
+
+import random
+from . import *
+from ..lexer import *
+
+def lex(src, reader):
+	comments = list()
+	r = [[(i.type, i.token, i.lineno, i.offset) for i in tl] for tl in parse_string(src, reader=reader, comments=comments)]
+	return (r, [(i.token, i.lineno, i.offset) for i in comments])
+
+def mutations(src, n, rnd):
+	# `src' with a random span deleted, duplicated or moved, to get to the error paths too
+	for _ in range(n):
+		i, j = sorted(rnd.randrange(len(src)+1) for _ in range(2))
+		k = rnd.randrange(len(src)+1)
+		yield rnd.choice((src[:i]+src[j:], src[:j]+src[i:j]+src[j:], src[:k]+src[i:j]+src[k:]))
+
+def main(seed=0, n=50):
+	rnd = random.Random(seed)
+	failures = total = 0
+	for name, src in test_sources():
+		for ii, i in enumerate((src, *mutations(src, n, rnd))):
+			total += 1
+			a, b = outcome(lex, i, read_token), outcome(lex, i, match_token)
+			if (a == b): continue
+			failures += 1
+			print(f"{name}{f' (mutation {ii})' if (ii) else ''}: read_token {a[1] if (not a[0]) else 'ok'}, match_token {b[1] if (not b[0]) else 'ok'}\n{S(i).indent()}")
+	report("match_token() vs read_token()", ok=f"{total-failures}/{total}")
+	return not failures
+
+if (__name__ == '__main__'): exit(not main())
@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+# Slang packrat parsing test: `build_ast()' with the memo against without it
+
+import random
+from . import *
+from .lexer import mutations
+from ..ast import *
+
+def dump(x):
+	# the tree below `x' as nested tuples, for comparing by value
+	if (isinstance(x, ASTNode)): return (type(x).__name__, x.lineno, x.offset, *((i, dump(getattr(x, i, None))) for i in ast_fields(x)))
+	if (isiterable(x) and not isinstance(x, str)): return (type(x).__name__, *map(dump, x))
+	return (type(x).__name__, str(x))
+
+def shared(ast):
+	# the nodes found at more than one place of the tree
+	seen = collections.Counter(map(id, walk_ast_nodes(ast)))
+	return [i for i in walk_ast_nodes(ast) if seen[id(i)] > 1]
+
+def build(src, packrat):
+	ast = build_ast(parse_string(src), 'test', packrat=packrat)
+	return (dump(ast), len(shared(ast)))
+
+def main(seed=0, n=20):
+	rnd = random.Random(seed)
+	failures = total = 0
+	for name, src in test_sources():
+		for ii, i in enumerate((src, *mutations(src, n, rnd))):
+			total += 1
+			a, b = outcome(build, i, False), outcome(build, i, True)
+			if (a == b and (not b[0] or not b[1][1])): continue
+			failures += 1
+			print(f"{name}{f' (mutation {ii})' if (ii) else ''}: {'shared nodes' if (a == b) else 'ASTs differ'}\n{S(i).indent()}")
+	report("build_ast(packrat=True) vs build_ast(packrat=False)", ok=f"{total-failures}/{total}")
+	return not failures
+
+if (__name__ == '__main__'): exit(not main())
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+# Slang validation test: `check_ast()' and `IncrementalValidator' against `validate_ast()'
+
+import random
+from . import *
+from ..ast import *
+
+statements = (  # what the generated modules are made of: a few names defined, redefined, overloaded, used before and after their definition and left behind by the code of functions
+	'int a = 1', 'str a = "x"', 'int b = a + 1', 'a = 5', 'int c = f(b)', 'int d = g(c)', 'b = f(a)',
+	'int f(int x) = x + a', 'int f(int x) = x * 2', 'int f(int x, int y) = x + y',
+	'int g(int y) {\n\tint z = f(y)\n\treturn z\n}', 'int u() {\n\tint z = 2\n\treturn x + z\n}', 'void setx() {\n\tx = 4\n}', 'void p(str q) {\n\tstdio.println(q + k)\n}',
+	'int r(int y) {\n\treturn y + undefined\n}', 'str t() = 5', 'auto w(int x) = x + 1',
+	'auto e = 3', 'int h = e * 2', "char k = 'q'", 'str s = k + "z"', 'const int m = 7', 'int n = m + c', 'int x', 'int z = 9',
+	'main {\n\tstdio.println(a)\n}', 'main {\n\tstdio.println(f(b))\n}', 'main {\n\tstdio.println(f(1, 2))\n}',
+)
+
+regressions = (  # versions of modules where they disagreed
+	# the overload a call needs is removed
+	('int f(int x) = x\nint f(int x, int y) = x + y\nmain {\n\tstdio.println(f(1, 2))\n}\n', 'int f(int x) = x\nmain {\n\tstdio.println(f(1, 2))\n}\n'),
+	# the argument that the code of a function left in the module signatures clashed with a later definition
+	('int f(int x) = x * 2\nint x\n',),
+	# a function validated anew after a name its code defines was defined before it gets the scope of its last version
+	('int u() {\n\tint z = 2\n\treturn z\n}\n', 'int z = 9\nint u() {\n\tint z = 2\n\treturn z\n}\n'),
+)
+
+def edit(l, rnd):
+	# `l' with a statement deleted, inserted, replaced or swapped with another
+	l = list(l)
+	op = rnd.randrange(4)
+	if (op == 0 and l): l.pop(rnd.randrange(len(l)))
+	elif (op == 1 or not l): l.insert(rnd.randint(0, len(l)), rnd.choice(statements))
+	elif (op == 2): l[rnd.randrange(len(l))] = rnd.choice(statements)
+	else:
+		i, j = rnd.randrange(len(l)), rnd.randrange(len(l))
+		l[i], l[j] = l[j], l[i]
+	return l
+
+def bindings(ns):
+	# the module namespace by value
+	return (sorted((k, str(v)) for k, v in ns.signatures.signatures.items()), sorted((k, repr(v)) for k, v in ns.values.values.items()))
+
+def validated(src, validate):
+	return outcome(lambda: validate(build_ast(parse_string(src), 'test')))
+
+def main(seed=0, n=100, versions=6):
+	# the test programs, the regressions and `n' generated modules in `versions' versions each, every version validated by each and, for `IncrementalValidator', one after another
+	rnd = random.Random(seed)
+	failures = total = 0
+	def compare(what, src, a, b):
+		nonlocal failures, total
+		total += 1
+		if (a == b): return
+		failures += 1
+		print(f"{what}: {b[1] if (not b[0]) else 'ok'}, validate_ast(): {a[1] if (not a[0]) else 'ok'}\n{S(src).indent()}")
+
+	modules = [(i,) for name, i in test_sources()]+list(regressions)
+	for _ in range(n):
+		l = [rnd.choice(statements) for _ in range(rnd.randint(1, 9))]
+		modules.append(['\n'.join(l)+'\n'])
+		for _ in range(versions-1):
+			l = edit(l, rnd)
+			modules[-1].append('\n'.join(l)+'\n')
+
+	for l in modules:
+		v = IncrementalValidator()
+		for src in l:
+			a = validated(src, lambda ast: bindings(validate_ast(ast)))
+			compare("IncrementalValidator", src, a, validated(src, lambda ast: bindings(v.validate(ast))))
+			for jobs in (1, 3): compare(f"check_ast(jobs={jobs})", src, a, validated(src, lambda ast: bindings(check_ast(ast, jobs=jobs))))
+	report("check_ast() and IncrementalValidator vs validate_ast()", ok=f"{total-failures}/{total}")
+	return not failures
+
+if (__name__ == '__main__'): exit(not main())
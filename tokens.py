@@ -83,92 +83,138 @@ logical_operators = ('is', 'is not', 'in', 'not in', 'not', 'and', 'but', 'xor',
 whitespace = ' \t\r\v\f'
 specials = ('..', ':=', *attrops, *r'#\,;?=()[]{}')
 
-def find_identifier(s):
-	if (not s or not s[0].isidentifier()): return
+# Lookup tables by first character, longest candidates first.
+operator_table = dict()
+for i in sorted(itertools.chain(*operators), key=len, reverse=True): operator_table.setdefault(i[0], dict()).setdefault(i, BothOperator(i) if (i in bothoperators) else i)
+special_table = dict()
+for i in sorted(specials, key=len, reverse=True): special_table[i[0]] = (*special_table.get(i[0], ()), i)
+keyword_table = dict()
+for i in keywords: keyword_table[i[0]] = (*keyword_table.get(i[0], ()), i)
+operator_precedences = dict()
+for ii, i in enumerate(operators):
+	for j in i: operator_precedences.setdefault((type(j), j), ii)
+operator_levels = {j: ii for ii, i in enumerate(operators) for j in i}  # the loosest-binding group an operator is split at
+
+def find_identifier(s, o=0):
+	if (not s[o:o+1].isidentifier()): return
 	i = 1
-	for i in range(1, len(s)):
-		if (not s[i].isalnum() and s[i] != '_'): break
+	for i in range(1, len(s)-o):
+		if (not s[o+i].isalnum() and s[o+i] != '_'): break
 	else: i += 1
-	if (s[:i].isidentifier()): return i
+	if (s[o:o+i].isidentifier()): return i
 	return (0, i)
 
-def find_keyword(s):
-	if (not s): return
-	for i in keywords:
-		if (s.startswith(i)):
+def find_keyword(s, o=0):
+	if (o >= len(s)): return
+	for i in keyword_table.get(s[o], ()):
+		if (s.startswith(i, o)):
 			l = len(i)
-			if (not s[l:l+1].isidentifier()): return (l, i)
+			if (not s[o+l:o+l+1].isidentifier()): return (l, i)
 
-def find_literal(s):
-	if (not s): return
-	if (s[0] in '"\''):
+def find_literal(s, o=0):
+	if (o >= len(s)): return
+	if (s[o] in '"\''):
 		esc = bool()
-		for i in range(1, len(s)):
+		for i in range(1, len(s)-o):
 			if (esc): esc = False; continue
-			if (s[i] == '\\'): esc = True; continue
-			if (s[i] == '\n'): break
-			if (s[i] == s[0]): return i+1
+			if (s[o+i] == '\\'): esc = True; continue
+			if (s[o+i] == '\n'): break
+			if (s[o+i] == s[o]): return i+1
 		return (0, i)
-	if (s[0].isdigit() or s[0] == '.'):
+	if (s[o].isdigit() or s[o] == '.'):
 		i = int()
 		digits = '0123456789abcdef'
 		radix = 10
 		digit = True
-		dp = (s[0] == '.')
-		for i in range(1, len(s)):
-			if (i == 1 and s[0] == '0'):
-				if (s[1] not in 'box'):
-					if (s[1].isalnum()): break
+		dp = (s[o] == '.')
+		for i in range(1, len(s)-o):
+			if (i == 1 and s[o] == '0'):
+				if (s[o+1] not in 'box'):
+					if (s[o+1].isalnum()): break
 					return 1
 				else:
-					radix = (2, 8, 16)['box'.index(s[1])]
+					radix = (2, 8, 16)['box'.index(s[o+1])]
 					digit = False
 					continue
-			if (s[i].casefold() not in digits[:radix]):
-				if (s[i] == '_'): continue
-				if (s[i] == '.' and not dp): dp = True; continue
-				if (not digit or s[i].isalnum()): break
+			if (s[o+i].casefold() not in digits[:radix]):
+				if (s[o+i] == '_'): continue
+				if (s[o+i] == '.' and not dp): dp = True; continue
+				if (not digit or s[o+i].isalnum()): break
 				return i
 			digit = True
 		else:
-			if (s[i].casefold() in digits[:radix] or s[i] == '.' and dp): return i+1
+			if (s[o+i].casefold() in digits[:radix] or s[o+i] == '.' and dp): return i+1
 		c = i
-		while (i < len(s) and (s[i].isalnum() or s[i] == '.')): i += 1
+		while (i < len(s)-o and (s[o+i].isalnum() or s[o+i] == '.')): i += 1
 		return (-i+1, c)
 
-def find_operator(s):
-	if (not s): return
-	for i in sorted(itertools.chain(*operators), key=len, reverse=True):
-		if (s.startswith(i)):
+def find_operator(s, o=0):
+	if (o >= len(s)): return
+	for i, v in operator_table.get(s[o], {}).items():
+		if (s.startswith(i, o)):
 			l = len(i)
-			if (not (i[-1].isalpha() and s[l:l+1].isidentifier())): return (l, BothOperator(i) if (i in bothoperators) else i)
-
-def find_special(s):
-	if (not s): return
-	if (s[0] == '.' and s[1:2].isdigit()): return
-	if (s[:2] == '#|'):
-		o = 2
-		l = 1
-		while (s[o:] and l > 0):
-			#if (s[o:o+3] in ('#|#', '|#|')): o += 2; break
-			if (s[o:o+2] == '#|'): l += 1; o += 2
-			elif (s[o:o+2] == '|#'): l -= 1; o += 2
-			else: o += 1
-		if (l > 0): return (0, o)
-		return o
-	if (s[0] == '#'):
-		s = s.partition('\n')[0]
-		return len(s) if (s[1:] and not s[1:].isspace()) else (0, 1)
-	if (s[0] == '\\'): return 1
-	for i in sorted(specials, key=len, reverse=True):
-		if (s[:len(i)] == i):
-			if (i == '=' and s[:len(i)+1] == '=='): break
+			if (not (i[-1].isalpha() and s[o+l:o+l+1].isidentifier())): return (l, v)
+
+def find_nested_comment(s, o=0):
+	l, o = 1, o+2
+	while (l > 0):
+		b = s.find('|#', o)
+		if (b < 0): return
+		a = s.find('#|', o, b+1)
+		if (a >= 0): l += 1; o = a+2
+		else: l -= 1; o = b+2
+	return o
+
+def find_special(s, o=0):
+	if (o >= len(s)): return
+	if (s[o] == '.' and s[o+1:o+2].isdigit()): return
+	if (s.startswith('#|', o)):
+		e = find_nested_comment(s, o)
+		if (e is None): return (0, len(s)-o)
+		return e-o
+	if (s[o] == '#'):
+		e = s.find('\n', o)
+		if (e < 0): e = len(s)
+		return e-o if (s[o+1:e] and not s[o+1:e].isspace()) else (0, 1)
+	if (s[o] == '\\'): return 1
+	for i in special_table.get(s[o], ()):
+		if (s.startswith(i, o)):
+			if (i == '=' and s.startswith('==', o)): break
 			return len(i)
 
 def operator_precedence(op):
-	for ii, i in enumerate(operators):
-		if (any(op == j and type(op) is type(j) for j in i)): return ii
-	else: raise WTFException(op)
+	try: return operator_precedences[type(op), op]
+	except KeyError: raise WTFException(op)
+
+def find_radix_literal(s, o=0):
+	digits = '0123456789abcdef'[:(2, 8, 16)['box'.index(s[o+1])]]
+	digit = dp = False
+	i = o+1
+	for i in range(o+2, len(s)):
+		if (s[i].casefold() not in digits):
+			if (s[i] == '_'): continue
+			if (s[i] == '.' and not dp): dp = True; continue
+			if (not digit or s[i].isalnum()): return
+			return i
+		digit = True
+	if (s[i].casefold() in digits or s[i] == '.' and dp): return i+1
+
+# Single-pass tokenizer: one alternative per token type, in `Token.types' resolution order.
+# Only ASCII is matched here; anything else (and every error) is left to the `find_*' functions.
+token_operators = {k: v for i in operator_table.values() for k, v in i.items()}
+token_keywords = {i: i for i in keywords}
+
+token_regex = re.compile(f"[{re.escape(whitespace)}]*(?:"
+	r"(?P<END>[\n;]|\Z)|"
+	r"(?P<NESTED>#\|)|"
+	r"(?P<SPECIAL>#(?=[^\n]*\S)[^\n]*|\\|(?!\.[0-9])(?:"+'|'.join(re.escape(i)+'(?!=)'*(i == '=') for i in sorted(specials, key=len, reverse=True) if i[0] not in '#\\')+"))|"
+	r"(?P<OPERATOR>"+'|'.join(re.escape(i)+'(?![A-Za-z_])'*i[-1].isalpha() for i in token_operators)+")|"
+	r"(?P<RADIX>0[box])|"
+	r"""(?P<LITERAL>"(?:\\[\s\S]|[^"\\\n])*"|'(?:\\[\s\S]|[^'\\\n])*'|0(?![0-9A-Za-z])|"""
+		r"[1-9][0-9_]*\.[0-9_]*(?:(?=[^0-9A-Za-z_])|(?<!_)\Z)|[1-9][0-9_]*(?:(?=[^0-9A-Za-z_.])|(?<!_)\Z)|\.[0-9][0-9_]*(?:(?=[^0-9A-Za-z_])|(?<!_)\Z))|"
+	r"(?P<KEYWORD>"+'|'.join(re.escape(i)+'(?![A-Za-z_])' for i in keywords)+")|"
+	r"(?P<IDENTIFIER>[A-Za-z_][A-Za-z0-9_]*)"
+")")
 
 class Token(Slots):
 	types = ('SPECIAL', 'OPERATOR', 'LITERAL', 'KEYWORD', 'IDENTIFIER')  # order in tuple is resolution order
@@ -194,6 +240,66 @@ class Token(Slots):
 	def length(self):
 		return len(self.token)
 
+class TokenCursor(Slots):
+	tokens: ...
+	pos: ...
+	end: ...
+	memo: ...
+
+	def __init__(self, tokens, pos=0, end=None, *, memo=None):
+		self.tokens, self.pos, self.end, self.memo = tokens, pos, len(tokens) if (end is None) else end, memo
+
+	def __repr__(self):
+		return f"<TokenCursor {list(self)}>"
+
+	def __len__(self):
+		return self.end-self.pos
+
+	def __bool__(self):
+		return self.pos < self.end
+
+	def __iter__(self):
+		return itertools.islice(self.tokens, self.pos, self.end)
+
+	def __getitem__(self, x):
+		if (isinstance(x, slice)):
+			start, stop, step = x.indices(len(self))
+			assert (step == 1)
+			return TokenCursor(self.tokens, self.pos+start, self.pos+max(start, stop), memo=self.memo)
+		if (x < 0): x += len(self)
+		if (not 0 <= x < len(self)): raise IndexError('list index out of range')
+		return self.tokens[self.pos+x]
+
+	def __setitem__(self, x, value):
+		assert (x == slice(None))
+		if (isinstance(value, TokenCursor)): self.reset(value.mark())
+		else: self.__init__(list(value), memo=({} if (self.memo is not None) else None))
+
+	def copy(self):
+		return TokenCursor(self.tokens, self.pos, self.end, memo=self.memo)
+
+	def pop(self, x=-1):
+		if (not self): raise IndexError('pop from empty list')
+		if (x == 0): self.pos += 1; return self.tokens[self.pos-1]
+		assert (x == -1)
+		self.end -= 1
+		return self.tokens[self.end]
+
+	def clear(self):
+		self.pos = self.end
+
+	def advance(self, n=1):
+		self.pos = min(self.pos+n, self.end)
+
+	def mark(self):
+		return (self.tokens, self.pos, self.end, self.memo)
+
+	def reset(self, mark):
+		self.tokens, self.pos, self.end, self.memo = mark
+
+def is_comment(tok):
+	return (tok.typename == 'SPECIAL' and (tok.token[0] == '#' or tok.token == '\\'))
+
 class SlSyntaxException(Exception, Slots): pass
 class SlSyntaxNoToken(SlSyntaxException): pass
 class SlSyntaxEmpty(SlSyntaxNoToken): pass